@@ -0,0 +1,169 @@
+"""Asyncio runtime: Telegram I/O and broadcast sends as coroutines.
+
+Updates are long-polled by a single coroutine and handed to the bot's
+existing (blocking) handlers on a bounded thread pool, so the thread count
+stays fixed no matter how many users are active. Selenium and portal work
+therefore never runs on more than ``workers`` threads.
+"""
+import asyncio
+import logging
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from telebot.async_telebot import AsyncTeleBot
+
+from broadcast_engine import FINAL, PER_CHAT_INTERVAL, TELEGRAM_GLOBAL_RATE, Delivery, TokenBucket
+
+
+class AsyncTokenBucket(TokenBucket):
+    """broadcast_engine.TokenBucket that waits with asyncio.sleep instead of blocking the loop."""
+
+    async def acquire(self):
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+class AsyncBroadcastEngine:
+    """Coroutine version of broadcast_engine.BroadcastEngine.
+
+    ``send(chat_id)`` is a coroutine performing the API call. Report entries
+    and retry rules come from broadcast_engine.Delivery, shared with the
+    threaded engine; only the waiting is asynchronous.
+    """
+
+    def __init__(self, rate=TELEGRAM_GLOBAL_RATE, concurrency=50, retries=3, per_chat_interval=PER_CHAT_INTERVAL):
+        self.rate = rate
+        self.concurrency = max(1, int(concurrency))
+        self.retries = max(1, int(retries))
+        self.per_chat_interval = per_chat_interval
+        self.bucket = None  # Created inside the running event loop
+        self._last_sent = {}
+
+    async def _pace_chat(self, chat_id):
+        now = time.monotonic()
+        ready_at = self._last_sent.get(chat_id, 0.0) + self.per_chat_interval
+        self._last_sent[chat_id] = max(now, ready_at)
+        if ready_at > now:
+            await asyncio.sleep(ready_at - now)
+
+    async def deliver(self, chat_id, send):
+        """Send to one chat with retries. Returns its delivery report entry."""
+        delivery = Delivery(chat_id, self.retries)
+        while delivery.next_attempt():
+            await self._pace_chat(chat_id)
+            await self.bucket.acquire()
+            try:
+                delivery.sent(await send(chat_id))
+                break
+            except Exception as e:
+                action, wait = delivery.failed(e, self.bucket)
+            if action == FINAL:
+                break
+            await asyncio.sleep(wait)
+        return delivery.entry
+
+    async def run(self, chat_ids, send, on_result=None):
+        """Deliver to every chat. Returns {chat_id: report entry}."""
+        if self.bucket is None:
+            self.bucket = AsyncTokenBucket(self.rate)
+        slots = asyncio.Semaphore(self.concurrency)
+        report = {}
+
+        async def deliver_and_report(chat_id):
+            async with slots:
+                report[chat_id] = await self.deliver(chat_id, send)
+            if on_result:
+                on_result(chat_id, report[chat_id])
+
+        await asyncio.gather(*(deliver_and_report(chat_id) for chat_id in chat_ids))
+        return report
+
+
+class AsyncRuntime:
+    """Long-poll Telegram from a coroutine and run a TeleBot's handlers on a bounded pool.
+
+    ``bot`` should be created with ``threaded=False`` so its handlers run on
+    this runtime's executor instead of the bot's own thread pool.
+    """
+
+    def __init__(self, bot, workers=8, poll_timeout=30, backoff_max=60):
+        self.bot = bot
+        self.client = AsyncTeleBot(bot.token)
+        self.workers = workers
+        self.poll_timeout = poll_timeout
+        self.backoff_max = backoff_max
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="AsyncRuntimeWorker")
+        self.processed = 0
+        self._stop = None
+
+    async def _dispatch(self, update, slots):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, self.bot.process_new_updates, [update])
+            self.processed += 1
+        except Exception as e:
+            logging.exception(f"Error handling update {update.update_id}: {e}")
+        finally:
+            slots.release()
+
+    async def _get_updates(self, offset):
+        """Long-poll once. Returns None if the runtime was stopped while waiting."""
+        fetch = asyncio.ensure_future(self.client.get_updates(offset=offset, timeout=self.poll_timeout,
+                                                              request_timeout=self.poll_timeout + 10))
+        stopped = asyncio.ensure_future(self._stop.wait())
+        await asyncio.wait({fetch, stopped}, return_when=asyncio.FIRST_COMPLETED)
+        if not fetch.done():
+            fetch.cancel()
+            return None
+        stopped.cancel()
+        return fetch.result()
+
+    async def poll(self):
+        """Fetch updates until stopped, retrying with exponential backoff after failures."""
+        # Updates waiting for a worker; beyond this, polling pauses instead of queueing more
+        slots = asyncio.Semaphore(self.workers * 4)
+        tasks = set()
+        offset = None
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                updates = await self._get_updates(offset)
+                backoff = 1
+            except Exception as e:
+                logging.exception(f"Async polling failed, retrying in {backoff}s: {e}")
+                try:
+                    await asyncio.wait_for(self._stop.wait(), backoff)
+                except asyncio.TimeoutError:
+                    pass
+                backoff = min(backoff * 2, self.backoff_max)
+                continue
+            for update in updates or ():
+                offset = update.update_id + 1
+                await slots.acquire()
+                task = asyncio.create_task(self._dispatch(update, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)  # Let updates already taken finish
+
+    async def run(self):
+        self._stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stop.set)
+        await self.client.delete_webhook()
+        logging.info(f"Async runtime started with {self.workers} handler workers")
+        try:
+            await self.poll()
+        finally:
+            logging.info("Shutting down async runtime")
+            await self.client.close_session()
+            self.executor.shutdown(wait=True)
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
@@ -0,0 +1,94 @@
+"""Compare page-ready time and memory of the lean browser profile against the plain one.
+
+Starts Chrome with each profile, loads the page several times and reports
+how long until the page is usable and the resident memory (RSS) of Chrome
+and all its child processes. Needs Chrome and ChromeDriver; paths are read
+from config.json unless given. RSS is read from /proc, so it is Linux only.
+
+    python bench_browser_profile.py --runs 5
+    python bench_browser_profile.py --url http://103.203.175.90:94/attendance/attendanceLogin.php
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from urllib.parse import urljoin
+
+from selenium.webdriver.common.by import By
+
+from browser_profile import new_browser
+from portal_http import DEFAULT_BASE_URL, LOGIN_PATH
+from readiness import first_present, wait_for
+
+
+def process_tree_rss(pid):
+    """Total RSS in MB of pid and all its descendants, from /proc."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                parent = int(file.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+
+    total_kb = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as file:
+                for line in file:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            pass
+    return total_kb / 1024
+
+
+def measure(profile, args):
+    """Return (page-ready seconds per run, RSS MB after the runs) for one profile."""
+    browser = new_browser(args.chrome_path, args.chromedriver_path, lean=(profile == "lean"))
+    try:
+        ready_times = []
+        for _ in range(args.runs):
+            browser.get("about:blank")
+            started = time.perf_counter()
+            browser.get(args.url)
+            wait_for(browser, f"bench_{profile}", first_present((By.XPATH, args.ready_xpath)), ceiling=60)
+            ready_times.append(time.perf_counter() - started)
+        return ready_times, process_tree_rss(browser.service.process.pid)
+    finally:
+        browser.quit()
+
+
+def main():
+    config = {}
+    if os.path.exists("config.json"):
+        with open("config.json") as file:
+            config = json.load(file)
+    base_url = config.get("portal_base_url", DEFAULT_BASE_URL)
+
+    parser = argparse.ArgumentParser(description="Benchmark the lean browser profile against the plain one.")
+    parser.add_argument("--url", default=urljoin(base_url, LOGIN_PATH), help="Page to load")
+    parser.add_argument("--ready-xpath", default="//form", help="Element that marks the page as usable")
+    parser.add_argument("--runs", type=int, default=5, help="Page loads per profile")
+    parser.add_argument("--chrome-path", default=config.get("chrome_path"))
+    parser.add_argument("--chromedriver-path", default=config.get("chromedriver_path"))
+    args = parser.parse_args()
+    if not args.chrome_path or not args.chromedriver_path:
+        parser.error("Chrome and ChromeDriver paths are needed (config.json or --chrome-path/--chromedriver-path)")
+
+    print(f"Loading {args.url} {args.runs} times per profile\n")
+    print(f"{'profile':>8} {'ready p50 (s)':>14} {'ready max (s)':>14} {'RSS (MB)':>10}")
+    for profile in ("plain", "lean"):
+        ready_times, rss = measure(profile, args)
+        print(f"{profile:>8} {statistics.median(ready_times):>14.3f} {max(ready_times):>14.3f} {rss:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
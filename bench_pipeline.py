@@ -0,0 +1,433 @@
+"""Offline benchmark of the lookup pipeline, without the college portal or Telegram.
+
+Two parts, both reporting throughput, latency percentiles and peak memory
+(tracemalloc):
+
+* parse: replays section pages of several sizes through
+  extract_attendance_data, get_student_mid_marks (with a fake webdriver that
+  only serves page_source) and the message formatters.
+* flow: runs whole attendance and mid marks lookups (HTTP fetch, parse,
+  section cache, reply) against a local stub portal and the fake Telegram
+  API. "cold" lookups each ask for a different section, "warm" lookups are
+  answered from the section cache. The Selenium path needs Chrome and is
+  covered by bench_browser_profile.py.
+
+The --json output also holds the p50 of every pipeline stage (from
+tracing.py) per run, and the git revision, for comparing commits.
+
+Pages are generated unless --fixtures points at recorded ones, saved as
+<page kind>-<label>.html (e.g. attendance-cse-c.html). --record saves the
+real pages of one class using the credentials in config.json:
+
+    python bench_pipeline.py
+    python bench_pipeline.py --students 30 70 150 300 --lookups 400 --concurrency 16
+    python bench_pipeline.py --record bench_fixtures --class 2024-25 31 5 C
+    python bench_pipeline.py --fixtures bench_fixtures --json results.json
+
+Everything runs in a temporary directory, so bot.log and the user database
+of the working directory are left alone.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import lxml.html
+from selenium.webdriver.common.by import By
+from telebot import apihelper, types
+
+from fake_telegram_api import FakeTelegramAPI
+from portal_http import LOGIN_PATH, PAGE_PATHS
+
+ATTENDANCE_PAGE = "attendance"
+MID_MARKS_PAGE = "mid_marks"
+PAGE_KINDS = (ATTENDANCE_PAGE, MID_MARKS_PAGE)
+
+SUBJECTS = ["DBMS", "CN", "OS", "SE", "AI", "DWM"]
+LABS = ["DW and M LAB", "AI LAB", "COMMUNICATION and SOFT SKILLS"]
+
+# Markup around the table, like the portal's header, menu and scripts
+PAGE_HEADER = ("<html><head><title>NBKRIST</title><script>function show(){}</script></head><body>"
+               + "<div class='menu'>" + "<a href='#'>link</a>" * 40 + "</div>")
+CLASS_FORM = ("<form method='post'><select name='acadYear'><option value='2024-25'>2024-25</option></select>"
+              "<select name='yearSem'><option value='31'>31</option></select>"
+              "<select name='branch'><option value='5'>CSE</option></select>"
+              "<select name='section'><option value='C'>C</option></select>"
+              "<input type='button' value='Show'></form>")
+LOGIN_FORM = ("<form name='frmAttLogin' method='post'><input id='username' name='username'>"
+              "<input id='password' name='password'><input type='submit'></form>")
+LOGIN_DONE = "<html><a id='nextPageAnchor' href='#'>Continue to Login / Requested Page</a></html>"
+
+
+def roll_number(index):
+    return f"22KB1A05{index:02d}" if index < 100 else f"22KB1A5{index:03d}"
+
+
+def attendance_page(students):
+    """An attendance section page with `students` rows, in the portal's markup."""
+    rows = []
+    for index in range(students):
+        rollno = roll_number(index)
+        cells = "".join(f"<td title='{subject}'>{20 + index % 15}/35</td>" for subject in SUBJECTS)
+        rows.append(f"<tr id='{rollno}'><td class='tdRollNo'>{rollno[:6]} {rollno[6:]}</td>"
+                    f"<td class='tdPercent'>{60 + index % 40}.5<br><font>{100 + index % 50}</font></td>"
+                    f"{cells}<td title='AI LAB(L)'>10/12</td></tr>")
+    return f"{PAGE_HEADER}{CLASS_FORM}<table><tr><th>Roll No</th></tr>{''.join(rows)}</table></body></html>"
+
+
+def mid_marks_page(students):
+    """A mid marks section page with `students` rows, in the portal's markup."""
+    rows = []
+    for index in range(students):
+        rollno = roll_number(index)
+        cells = "".join(f"<td name='{subject}'>{10 + index % 20}/{12 + index % 18}({11 + index % 19})</td>"
+                        for subject in SUBJECTS)
+        labs = "".join(f"<td>{30 + index % 10}</td>" for _ in LABS)
+        rows.append(f"<tr name='{rollno}'><td>{index + 1}</td><td>{rollno}</td>{cells}{labs}</tr>")
+    return (f"{PAGE_HEADER}{CLASS_FORM}<table><tr><td>Mid marks</td></tr></table>"
+            f"<table><tr><th>S.No</th></tr>{''.join(rows)}</table></body></html>")
+
+
+PAGE_BUILDERS = {ATTENDANCE_PAGE: attendance_page, MID_MARKS_PAGE: mid_marks_page}
+
+
+def generate_fixtures(sizes):
+    """{page kind: [(label, html)]} with one generated page per class size."""
+    return {kind: [(f"{students} students", build(students)) for students in sizes]
+            for kind, build in PAGE_BUILDERS.items()}
+
+
+def load_fixtures(directory):
+    """{page kind: [(label, html)]} from <page kind>-<label>.html files."""
+    fixtures = {kind: [] for kind in PAGE_KINDS}
+    for name in sorted(os.listdir(directory)):
+        kind, _, label = name[:-len(".html")].partition("-")
+        if name.endswith(".html") and kind in fixtures:
+            with open(os.path.join(directory, name), encoding="utf-8") as file:
+                fixtures[kind].append((label or kind, file.read()))
+    return fixtures
+
+
+def record_fixtures(directory, selection):
+    """Fetch one class's real section pages with the credentials in config.json and save them."""
+    from portal_http import DEFAULT_BASE_URL, PortalHttpClient
+    from portal_session import PortalSession
+
+    with open("config.json") as file:
+        config = json.load(file)
+    client = PortalHttpClient(config.get("login_credentials", []), None,
+                              base_url=config.get("portal_base_url", DEFAULT_BASE_URL))
+    client.portal_session = PortalSession(login_func=client.login)
+    os.makedirs(directory, exist_ok=True)
+    label = "-".join(selection).lower()
+    for kind in PAGE_KINDS:
+        path = os.path.join(directory, f"{kind}-{label}.html")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(client.fetch_section(kind, *selection))
+        print(f"Saved {path}")
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda fraction: samples[min(len(samples) - 1, int(len(samples) * fraction))]
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+def measure(func, calls):
+    """Run func() `calls` times; return throughput, latency percentiles (ms) and peak memory (MB).
+
+    Memory is measured in a separate pass, since tracemalloc slows every allocation.
+    """
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(calls):
+        call_started = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - call_started) * 1000)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"ops_per_s": calls / elapsed, **percentiles(latencies), "peak_mb": peak / 1024 / 1024}
+
+
+class FakeDriver:
+    """Just enough of a webdriver for get_student_mid_marks / extract_attendance_data."""
+
+    def __init__(self, page_source):
+        self.page_source = page_source
+
+    def find_elements(self, by, value):
+        if by == By.XPATH:
+            return [dict(element.attrib) for element in lxml.html.document_fromstring(self.page_source).xpath(value)]
+        return [value] if f"<{value}" in self.page_source else []
+
+
+class StubPortal:
+    """Local stand-in for the portal: login form, class selection form and a section page per page kind."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.pages = {}  # page kind -> section page HTML returned by the form POST
+        self.posts = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.server.daemon_threads = True
+        self.server.request_queue_size = 256
+        self._kinds = {path: kind for kind, path in PAGE_PATHS.items()}
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="StubPortal", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler_class(self):
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, body, cookie=None):
+                if portal.latency:
+                    time.sleep(portal.latency)
+                body = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                if cookie:
+                    self.send_header("Set-Cookie", cookie)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _logged_in(self):
+                return "PHPSESSID=bench" in (self.headers.get("Cookie") or "")
+
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                if path == LOGIN_PATH or not self._logged_in():
+                    return self._send(LOGIN_FORM)
+                self._send(CLASS_FORM)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                path = urlsplit(self.path).path
+                if path == LOGIN_PATH:
+                    return self._send(LOGIN_DONE, "PHPSESSID=bench; Path=/")
+                if not self._logged_in():
+                    return self._send(LOGIN_FORM)
+                with portal._lock:
+                    portal.posts += 1
+                self._send(portal.pages.get(portal._kinds.get(path), CLASS_FORM))
+
+        return Handler
+
+
+def bench_parse(bot, fixtures, calls):
+    """Time the parsing and formatting hot paths on every fixture."""
+    results = []
+    for kind, pages in fixtures.items():
+        for label, html in pages:
+            rows = bot.SECTION_PARSERS[kind](html)
+            if not rows:
+                print(f"  skipping {kind} {label}: no student rows")
+                continue
+            rollno = sorted(rows)[len(rows) // 2]
+            driver = FakeDriver(html)
+            if kind == ATTENDANCE_PAGE:
+                data = bot.extract_attendance_data(driver, rollno)
+                steps = [("extract_attendance_data", lambda: bot.extract_attendance_data(driver, rollno)),
+                         ("format_attendance_message", lambda: bot.format_attendance_message(data))]
+            else:
+                data = bot.get_student_mid_marks(driver, rollno)
+                steps = [("get_student_mid_marks", lambda: bot.get_student_mid_marks(driver, rollno)),
+                         ("format_mid_marks_message", lambda: bot.format_mid_marks_message(data))]
+            for name, func in steps:
+                result = measure(func, calls)
+                results.append({"step": name, "fixture": label, "rows": len(rows), "page_kb": len(html) / 1024, **result})
+    return results
+
+
+def run_lookups(bot, lookups, concurrency):
+    """Run (page kind, selection, rollno) lookups on `concurrency` threads; return latencies (ms) and elapsed."""
+    handlers = {ATTENDANCE_PAGE: bot.handle_user_request, MID_MARKS_PAGE: bot.handle_mid_marks_request}
+    chat_ids = itertools.count(1000)
+    lock = threading.Lock()
+
+    def lookup(job):
+        kind, selection, rollno = job
+        with lock:
+            chat_id = next(chat_ids)
+        message = types.Message.de_json({
+            "message_id": chat_id, "date": int(time.time()), "text": rollno,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Bench"},
+        })
+        started = time.perf_counter()
+        handlers[kind](message, *selection, rollno)
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(lookup, lookups))
+    return latencies, time.perf_counter() - started
+
+
+def bench_flow(bot, portal, api, fixtures, count, concurrency):
+    """Time whole lookups per page kind and fixture, cold (portal fetch) and warm (section cache)."""
+    classes = list(itertools.product(
+        [value for value, _ in bot.menus.YEARS_OF_STUDY], sorted(set(bot.BRANCH_CODES.values())),
+        [section for section in bot.SECTIONS if section != "-"]))
+    results = []
+    for kind, pages in fixtures.items():
+        for label, html in pages:
+            rows = bot.SECTION_PARSERS[kind](html)
+            if not rows:
+                continue
+            rollno = sorted(rows)[len(rows) // 2]
+            portal.pages[kind] = html
+            for scenario in ("cold", "warm"):
+                if scenario == "cold":
+                    lookups = [(kind, ("2024-25", *classes[index % len(classes)]), rollno) for index in range(count)]
+                else:
+                    lookups = [(kind, ("2024-25", *classes[0]), rollno)] * count
+
+                def prepare():
+                    bot.section_cache.invalidate()
+                    if scenario == "warm":
+                        run_lookups(bot, lookups[:1], 1)  # Fill the cache
+
+                prepare()
+                posts, sends = portal.posts, api.count("sendMessage")
+                bot.tracing.reset()
+                latencies, elapsed = run_lookups(bot, lookups, concurrency)
+                stages = bot.tracing.stats().get(kind, {})
+                fetches, messages = portal.posts - posts, api.count("sendMessage") - sends
+
+                # Memory in a second pass, since tracemalloc slows every allocation
+                prepare()
+                tracemalloc.start()
+                run_lookups(bot, lookups, concurrency)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                results.append({
+                    "page_kind": kind, "fixture": label, "scenario": scenario, "lookups": count,
+                    "lookups_per_s": count / elapsed, **percentiles(latencies), "peak_mb": peak / 1024 / 1024,
+                    "portal_fetches": fetches, "messages": messages,
+                    "stages_p50_ms": {name: entry["p50"] * 1000 for name, entry in stages.items()},
+                })
+    return results
+
+
+def import_bot(workdir, portal, api, concurrency):
+    """Import demo1_bot with a bench config in `workdir`, fetching over HTTP from the stub portal."""
+    config = {
+        "api_key": "123456:BENCH",
+        "chrome_path": "/nonexistent/chrome",
+        "chromedriver_path": "/nonexistent/chromedriver",
+        "login_credentials": [{"username": "bench", "password": "bench"}],
+        "browser_pool_size": 0,
+        "portal_base_url": portal.base_url,
+        "fetch_backend": {ATTENDANCE_PAGE: "http", MID_MARKS_PAGE: "http"},
+        "section_cache_size": 1024,
+        "send_rate": 100000,  # Measure the pipeline, not Telegram's rate limit
+        "telegram_http_pool_size": max(32, concurrency),
+    }
+    with open(os.path.join(workdir, "config.json"), "w") as file:
+        json.dump(config, file)
+    os.chdir(workdir)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import demo1_bot
+    apihelper.API_URL = api.api_url
+    logging.getLogger().setLevel(logging.WARNING)  # Per-message INFO logging would dominate the timings
+    return demo1_bot
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, nargs="+", default=[30, 70, 150, 300],
+                        help="Class sizes of the generated pages")
+    parser.add_argument("--fixtures", help="Directory of recorded <page kind>-<label>.html pages to use instead")
+    parser.add_argument("--record", metavar="DIR", help="Save the real pages of --class into DIR and exit")
+    parser.add_argument("--class", dest="selection", nargs=4, metavar=("YEAR", "YEAR_OF_STUDY", "BRANCH", "SECTION"),
+                        default=["2024-25", "31", "5", "C"], help="Class recorded by --record")
+    parser.add_argument("--calls", type=int, default=200, help="Calls per parse/format step and fixture")
+    parser.add_argument("--lookups", type=int, default=200, help="Lookups per flow scenario and fixture")
+    parser.add_argument("--concurrency", type=int, default=8, help="Lookups running at the same time")
+    parser.add_argument("--portal-latency", type=float, default=0.0, help="Simulated portal response time in seconds")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="Simulated Bot API round trip in seconds")
+    parser.add_argument("--skip-flow", action="store_true", help="Only run the parse benchmark")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    if args.json:
+        args.json = os.path.abspath(args.json)  # The benchmark runs in a temporary directory
+    if args.record:
+        record_fixtures(args.record, args.selection)
+        return
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else generate_fixtures(args.students)
+    if not any(fixtures.values()):
+        parser.error(f"No <page kind>-<label>.html files in {args.fixtures}")
+
+    portal = StubPortal(latency=args.portal_latency).start()
+    api = FakeTelegramAPI(latency=args.telegram_latency).start()
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    bot = import_bot(workdir, portal, api, args.concurrency)
+
+    print(f"Parsing and formatting ({args.calls} calls each, parser backend {bot.portal_parser.BACKEND})\n")
+    print(f"{'step':<26} {'fixture':<14} {'rows':>5} {'KB':>7} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'peak MB':>8}")
+    parse_results = bench_parse(bot, fixtures, args.calls)
+    for r in parse_results:
+        print(f"{r['step']:<26} {r['fixture']:<14} {r['rows']:>5} {r['page_kb']:>7.1f} {r['ops_per_s']:>9.0f} "
+              f"{r['p50']:>8.3f} {r['p95']:>8.3f} {r['p99']:>8.3f} {r['peak_mb']:>8.2f}")
+
+    flow_results = []
+    if not args.skip_flow:
+        print(f"\nWhole lookups ({args.lookups} per run, concurrency {args.concurrency}, HTTP backend)\n")
+        print(f"{'page':<10} {'fixture':<14} {'run':<5} {'lookups/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'peak MB':>8} {'fetches':>8}")
+        bot.portal_session.refresh(bot.portal_session.generation)  # Log in now, not inside the first run
+        flow_results = bench_flow(bot, portal, api, fixtures, args.lookups, args.concurrency)
+        for r in flow_results:
+            print(f"{r['page_kind']:<10} {r['fixture']:<14} {r['scenario']:<5} {r['lookups_per_s']:>10.1f} "
+                  f"{r['p50']:>8.2f} {r['p95']:>8.2f} {r['p99']:>8.2f} {r['peak_mb']:>8.2f} {r['portal_fetches']:>8}")
+
+    portal.stop()
+    api.stop()
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"revision": git_revision(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "parse": parse_results, "flow": flow_results}, file, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark reply throughput under N concurrent handlers.
+
+Compares the old approach (every send behind one global lock) with
+TelegramSender (per-chat ordering, global rate limit, pooled keep-alive
+connections). Runs against the local fake Telegram API, so nothing is sent.
+
+    python bench_reply_throughput.py --handlers 1 8 32 --replies 20 --latency 0.05
+"""
+import argparse
+import threading
+import time
+
+from telebot import TeleBot, apihelper
+
+from fake_telegram_api import FakeTelegramAPI
+from telegram_sender import TelegramSender, use_pooled_session
+
+
+def run_handlers(handlers, replies, send):
+    """Start `handlers` threads, each sending `replies` messages to its own chat."""
+    def handler(chat_id):
+        for number in range(replies):
+            send(chat_id, f"reply {number}")
+
+    threads = [threading.Thread(target=handler, args=(chat_id,)) for chat_id in range(1, handlers + 1)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--handlers", type=int, nargs="+", default=[1, 8, 32], help="Concurrent handler counts to test")
+    parser.add_argument("--replies", type=int, default=20, help="Replies sent by each handler")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated Bot API round trip in seconds")
+    parser.add_argument("--rate", type=float, default=1000,
+                        help="TelegramSender rate limit; the bot uses 25/s, set high here to measure the sending path")
+    args = parser.parse_args()
+
+    api = FakeTelegramAPI(latency=args.latency).start()
+    apihelper.API_URL = api.api_url
+    bot = TeleBot("123456:BENCH", threaded=False)
+
+    bot_lock = threading.Lock()
+
+    def send_with_global_lock(chat_id, text):
+        with bot_lock:
+            bot.send_message(chat_id, text)
+
+    print(f"{'handlers':>8} {'global lock msg/s':>18} {'sender msg/s':>13} {'speedup':>8}")
+    for handlers in args.handlers:
+        total = handlers * args.replies
+
+        apihelper.session = None  # telebot default: one session per thread
+        locked = run_handlers(handlers, args.replies, send_with_global_lock)
+
+        use_pooled_session(max(handlers, 1))
+        sender = TelegramSender(rate=args.rate)
+        pooled = run_handlers(handlers, args.replies,
+                              lambda chat_id, text: sender.call(chat_id, bot.send_message, chat_id, text))
+
+        print(f"{handlers:>8} {total / locked:>18.1f} {total / pooled:>13.1f} {locked / pooled:>7.1f}x")
+
+    api.stop()
+
+
+if __name__ == "__main__":
+    main()
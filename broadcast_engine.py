@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+TELEGRAM_GLOBAL_RATE = 25  # Messages per second, below Telegram's ~30/s bot limit
+PER_CHAT_INTERVAL = 1.0  # Minimum seconds between two messages to the same chat
+MAX_FLOOD_WAITS = 5  # 429 waits per chat that do not count as failed attempts
+
+# What Delivery.failed() asks the engine to do next
+RETRY = "retry"  # Wait the given seconds, then retry
+FINAL = "final"  # Stop; the report entry is complete
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting how many sends start per second."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        """Stop handing out tokens for a while (e.g. after a 429)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def _take(self):
+        """Take a token if one is free. Returns 0, or the seconds to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                self._updated = self._paused_until
+                return self._paused_until - now
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class Delivery:
+    """Retry policy and report entry of one chat's delivery.
+
+    Shared by the threaded and the asyncio engine, which only differ in how
+    they wait. Flood errors (429) pause every sender for ``retry_after``
+    seconds and, up to MAX_FLOOD_WAITS times, do not use up an attempt; 403
+    (user blocked the bot) and 400 are final; anything else is retried with
+    exponential backoff.
+    """
+
+    def __init__(self, chat_id, retries):
+        self.chat_id = chat_id
+        self.retries = retries
+        self.entry = {"status": "failed", "attempts": 0, "error": None}
+        self.backoff = 1.0
+        self.floods = 0
+
+    def next_attempt(self):
+        """Count a new attempt. False once every attempt is used."""
+        if self.entry["attempts"] >= self.retries:
+            return False
+        self.entry["attempts"] += 1
+        return True
+
+    def sent(self, result):
+        self.entry.update(status="sent", error=None, result=result)
+
+    def failed(self, error, bucket):
+        """Record a failed attempt. Returns (RETRY | FINAL, seconds to wait).
+
+        A 429 pauses every sender sharing `bucket`, even when this chat has no
+        attempts left.
+        """
+        error_code = getattr(error, "error_code", None)  # Telegram API errors, sync or async
+        if error_code is None:
+            self.entry["error"] = str(error)
+        else:
+            self.entry["error"] = error.description
+            if error_code == 429:
+                retry_after = ((error.result_json or {}).get("parameters") or {}).get("retry_after", self.backoff)
+                logging.warning(f"Flood limit hit sending to {self.chat_id}, pausing {retry_after}s")
+                bucket.pause(retry_after)
+                self.floods += 1
+                if self.floods <= MAX_FLOOD_WAITS:
+                    self.entry["attempts"] -= 1  # Waiting out a flood limit is not a failed attempt
+                if self.entry["attempts"] >= self.retries:
+                    return FINAL, 0  # No attempt left to wait for
+                return RETRY, retry_after
+            if error_code == 403:
+                self.entry["status"] = "blocked"
+                return FINAL, 0
+            if error_code == 400:
+                return FINAL, 0
+        if self.entry["attempts"] >= self.retries:
+            return FINAL, 0
+        wait = self.backoff
+        self.backoff *= 2
+        return RETRY, wait
+
+
+class BroadcastEngine:
+    """Send one payload to many chats concurrently within Telegram's rate limits.
+
+    ``send(chat_id)`` performs the actual API call. Retries follow Delivery:
+    429 pauses every sender, 403 and 400 are final, other errors back off.
+    """
+
+    def __init__(self, rate=TELEGRAM_GLOBAL_RATE, concurrency=8, retries=3, per_chat_interval=PER_CHAT_INTERVAL):
+        self.bucket = TokenBucket(rate)
+        self.concurrency = max(1, int(concurrency))
+        self.retries = max(1, int(retries))
+        self.per_chat_interval = per_chat_interval
+        self._last_sent = {}  # chat id -> time of last send, kept across broadcasts
+        self._chat_lock = threading.Lock()
+
+    def _pace_chat(self, chat_id):
+        with self._chat_lock:
+            now = time.monotonic()
+            ready_at = self._last_sent.get(chat_id, 0.0) + self.per_chat_interval
+            self._last_sent[chat_id] = max(now, ready_at)
+        if ready_at > now:
+            time.sleep(ready_at - now)
+
+    def deliver(self, chat_id, send):
+        """Send to one chat with retries. Returns its delivery report entry."""
+        delivery = Delivery(chat_id, self.retries)
+        while delivery.next_attempt():
+            self._pace_chat(chat_id)
+            self.bucket.acquire()
+            try:
+                delivery.sent(send(chat_id))
+                break
+            except Exception as e:
+                action, wait = delivery.failed(e, self.bucket)
+            if action == FINAL:
+                break
+            time.sleep(wait)
+        return delivery.entry
+
+    def run(self, chat_ids, send, on_result=None):
+        """Deliver to every chat. Returns {chat_id: report entry}.
+
+        ``on_result(chat_id, entry)`` is called from the sending thread as soon
+        as each delivery finishes.
+        """
+        def deliver_and_report(chat_id):
+            entry = self.deliver(chat_id, send)
+            if on_result:
+                on_result(chat_id, entry)
+            return entry
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="Broadcast") as executor:
+            futures = {executor.submit(deliver_and_report, chat_id): chat_id for chat_id in chat_ids}
+            return {futures[future]: future.result() for future in as_completed(futures)}
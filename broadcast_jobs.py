@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+# Directory holding one metadata file and one result log per broadcast job
+JOBS_DIR = "broadcast_jobs"
+
+# Recipient states that are never sent again when a job is resumed
+FINAL_STATES = ("sent", "blocked")
+
+
+def _write_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(data, file, indent=4)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class BroadcastJob:
+    """A persistent broadcast: payload, ordered recipients, cursor and per-recipient status.
+
+    Metadata lives in ``<id>.json`` and is rewritten atomically at checkpoints.
+    Every delivery result is appended to ``<id>.results.jsonl`` as soon as it
+    is known, so a crash loses nothing and a resumed job skips everyone who
+    was already reached.
+    """
+
+    def __init__(self, job_id, kind, payload, recipients, cursor=0, state="running", created=None):
+        self.id = job_id
+        self.kind = kind
+        self.payload = payload
+        self.recipients = [str(user_id) for user_id in recipients]
+        self.cursor = cursor  # Index of the first recipient not yet dispatched
+        self.state = state
+        self.created = created or time.strftime("%Y-%m-%d %H:%M:%S")
+        self.results = {}  # user_id -> {"status", "attempts", "error"}
+        self._lock = threading.Lock()
+        self._log = None
+
+    @property
+    def meta_path(self):
+        return os.path.join(JOBS_DIR, f"{self.id}.json")
+
+    @property
+    def results_path(self):
+        return os.path.join(JOBS_DIR, f"{self.id}.results.jsonl")
+
+    @classmethod
+    def create(cls, kind, payload, recipients):
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        job_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        job = cls(job_id, kind, payload, recipients)
+        job.save()
+        return job
+
+    @classmethod
+    def load(cls, job_id):
+        with open(os.path.join(JOBS_DIR, f"{job_id}.json"), "r") as file:
+            meta = json.load(file)
+        job = cls(meta["id"], meta["kind"], meta["payload"], meta["recipients"],
+                  cursor=meta.get("cursor", 0), state=meta.get("state", "running"), created=meta.get("created"))
+        if os.path.exists(job.results_path):
+            with open(job.results_path, "r") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Last line may be cut short by a crash
+                    job.results[entry.pop("user_id")] = entry
+        return job
+
+    def save(self):
+        with self._lock:
+            _write_atomic(self.meta_path, {
+                "id": self.id,
+                "kind": self.kind,
+                "payload": self.payload,
+                "recipients": self.recipients,
+                "cursor": self.cursor,
+                "state": self.state,
+                "created": self.created,
+            })
+
+    def record(self, user_id, entry):
+        """Append one recipient's delivery result to the job log."""
+        result = {"status": entry["status"], "attempts": entry["attempts"], "error": entry["error"]}
+        with self._lock:
+            self.results[user_id] = result
+            if self._log is None:
+                self._log = open(self.results_path, "a")
+            self._log.write(json.dumps({"user_id": user_id, **result}) + "\n")
+            self._log.flush()
+
+    def pending(self):
+        """Recipients that still need a message, in order."""
+        return [user_id for user_id in self.recipients
+                if self.results.get(user_id, {}).get("status") not in FINAL_STATES]
+
+    def blocked(self):
+        return [user_id for user_id, entry in self.results.items() if entry["status"] == "blocked"]
+
+    def finish(self):
+        self.cursor = len(self.recipients)
+        self.state = "done"
+        self.save()
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
@@ -0,0 +1,127 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class BrowserPool:
+    """Bounded, thread-safe pool of warm headless browsers.
+
+    Browsers are created by ``factory`` and prepared once by ``warmup``
+    (e.g. navigate + login). A browser is recycled after ``max_uses``
+    checkouts, when it fails its health check, or when the code using it
+    raises an exception.
+    """
+
+    def __init__(self, factory, size=2, max_uses=50, warmup=None, checkout_timeout=None):
+        self.factory = factory
+        self.size = max(1, int(size))
+        self.max_uses = max(1, int(max_uses))
+        self.warmup = warmup
+        self.checkout_timeout = checkout_timeout
+        self._idle = queue.LifoQueue()  # Most recently used first keeps fewer browsers hot
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _launch(self):
+        browser = self.factory()
+        if self.warmup:
+            try:
+                self.warmup(browser)
+            except Exception as e:
+                logging.warning(f"Browser warmup failed, browser will log in on demand: {e}")
+        with self._lock:
+            self._uses[id(browser)] = 0
+        logging.info("Launched pooled browser.")
+        return browser
+
+    def _discard(self, browser):
+        with self._lock:
+            self._uses.pop(id(browser), None)
+        try:
+            browser.quit()
+        except Exception as e:
+            logging.warning(f"Error quitting pooled browser: {e}")
+
+    def _is_healthy(self, browser):
+        try:
+            browser.current_url  # Round trip to chromedriver; fails if Chrome died
+            return True
+        except Exception as e:
+            logging.warning(f"Pooled browser failed health check: {e}")
+            return False
+
+    def prefill(self):
+        """Launch browsers until the pool is full. Safe to run in a background thread."""
+        launched = []
+        try:
+            while len(launched) < self.size and self._slots.acquire(blocking=False):
+                try:
+                    launched.append(self._launch())
+                except Exception:
+                    self._slots.release()
+                    raise
+        except Exception as e:
+            logging.exception(f"Error pre-launching browsers: {e}")
+        finally:
+            for browser in launched:
+                self._idle.put(browser)
+                self._slots.release()
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise TimeoutError("Timed out waiting for a free browser")
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._is_healthy(browser):
+                return browser
+            self._discard(browser)
+        try:
+            return self._launch()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, browser, broken=False):
+        try:
+            with self._lock:
+                uses = self._uses.get(id(browser), 0) + 1
+                self._uses[id(browser)] = uses
+            if broken or self._closed or uses >= self.max_uses:
+                logging.info(f"Recycling pooled browser after {uses} uses (broken={broken}).")
+                self._discard(browser)
+            else:
+                self._idle.put(browser)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def browser(self):
+        """Check a browser out of the pool and return it when done."""
+        browser = self._acquire()
+        broken = False
+        start = time.time()
+        try:
+            yield browser
+        except Exception:
+            broken = True
+            raise
+        finally:
+            logging.info(f"Browser checked back in after {time.time() - start:.2f}s.")
+            self._release(browser, broken=broken or not self._is_healthy(browser))
+
+    def close(self):
+        """Quit every idle browser. Browsers checked out are quit on release."""
+        self._closed = True
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(browser)
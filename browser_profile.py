@@ -0,0 +1,102 @@
+"""Chrome settings shared by every headless browser the bot starts.
+
+The lean profile skips everything the scraper never looks at: images,
+stylesheets and fonts are disabled in the content settings and also blocked
+at the network level through the DevTools protocol, pages count as loaded
+once the DOM is ready (``pageLoadStrategy: eager``), and caches and
+background services are kept small.
+"""
+import os
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+# Used by every profile; exactly the arguments launch_browser() used before the
+# lean profile. Plain --headless because chrome-headless-shell (what
+# install_chrome_chromedriver.py installs) only has the old headless mode.
+BASE_ARGUMENTS = [
+    "--headless",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+]
+
+# Memory and background work the scraper does not need
+LEAN_ARGUMENTS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-software-rasterizer",
+    "--mute-audio",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disk-cache-size=1048576",
+    "--renderer-process-limit=1",
+    "--js-flags=--max-old-space-size=128",
+    "--window-size=1280,800",
+    "--log-level=3",
+]
+
+# 2 = block for images, stylesheets and fonts
+LEAN_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.managed_default_content_settings.stylesheets": 2,
+    "profile.managed_default_content_settings.fonts": 2,
+    "profile.default_content_setting_values.notifications": 2,
+}
+
+# Requests for these never leave the browser (Network.setBlockedURLs patterns)
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp", "*.bmp",
+    "*.css",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+]
+
+
+def chrome_options(chrome_path=None, lean=True):
+    """Build the Chrome options.
+
+    lean=False gives exactly the options launch_browser() used before the lean
+    profile, so bench_browser_profile.py measures only the lean settings.
+    """
+    options = Options()
+    for argument in BASE_ARGUMENTS:
+        options.add_argument(argument)
+    if lean:
+        for argument in LEAN_ARGUMENTS:
+            options.add_argument(argument)
+        options.add_experimental_option("prefs", LEAN_PREFS)
+        options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
+        options.page_load_strategy = "eager"
+    if chrome_path:
+        options.binary_location = chrome_path
+    return options
+
+
+def block_resources(browser, patterns=BLOCKED_URL_PATTERNS):
+    """Block non-document requests at the network level via the DevTools protocol."""
+    browser.execute_cdp_cmd("Network.enable", {})
+    browser.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+
+
+def new_browser(chrome_path, chromedriver_path, lean=True, page_load_timeout=None):
+    """Start a headless Chrome with the shared profile."""
+    if not os.path.isfile(chrome_path):
+        raise FileNotFoundError(f"Chrome binary not found at {chrome_path}")
+    if not os.path.isfile(chromedriver_path):
+        raise FileNotFoundError(f"ChromeDriver not found at {chromedriver_path}")
+    service = Service(executable_path=chromedriver_path)
+    browser = webdriver.Chrome(service=service, options=chrome_options(chrome_path, lean))
+    try:
+        if lean:
+            block_resources(browser)
+        if page_load_timeout:
+            browser.set_page_load_timeout(page_load_timeout)
+    except Exception:
+        browser.quit()
+        raise
+    return browser
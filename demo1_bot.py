@@ -1,11 +1,8 @@
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 from telebot import types
-from user_data_manager import update_user_data, get_user_data
+from user_data_manager import update_user_fields, class_counts
 import telebot
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 import time
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -13,14 +10,36 @@ import logging
 from logging.handlers import RotatingFileHandler
 import re
 import threading
+import atexit
+import signal
 from contextlib import contextmanager
 import os
 import json
-from bs4 import BeautifulSoup
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, ElementClickInterceptedException
 from selenium.webdriver.support.ui import Select
 from collections import defaultdict
 from datetime import datetime
+from browser_pool import BrowserPool
+from browser_profile import new_browser
+from section_cache import SectionCache
+from membership_cache import MembershipCache
+from telegram_sender import TelegramSender, use_pooled_session
+import menus
+from singleflight import SingleFlight
+from job_queue import JobScheduler, QueueFull, DuplicateJob
+from portal_session import PortalSession
+from portal_http import PortalHttpClient, DEFAULT_BASE_URL, PAGE_PATHS
+import portal_parser
+from portal_parser import extract_attendance_rows, extract_mid_marks_rows
+from urllib.parse import urljoin
+from webhook_server import WebhookServer
+from readiness import wait_for, first_present, all_present, clickable, ATTENDANCE_ROW, MID_MARKS_ROW
+from async_runtime import AsyncRuntime
+import readiness
+import tracing
+from tracing import stage, MetricsServer
+from prewarm import Prewarmer, SectionDemand, popular_sections
+import asyncio
 
 # Earn Money Feature Constants
 WORKING_CREDENTIALS_FILE = "working_credentials.json"
@@ -93,9 +112,37 @@ API_KEY = config['api_key']
 CHROME_PATH = config['chrome_path']
 CHROMEDRIVER_PATH = config['chromedriver_path']
 LOGIN_CREDENTIALS = config.get('login_credentials', [])
-
-# Constants for mid-marks URL
-MID_MARKS_URL = "http://103.203.175.90:94/mid_marks/classSelectionForMarksDisplay.php"
+BROWSER_POOL_SIZE = config.get('browser_pool_size', 2)  # Number of warm browsers kept ready
+BROWSER_MAX_USES = config.get('browser_max_uses', 50)  # Recycle a browser after this many requests
+BROWSER_CHECKOUT_TIMEOUT = config.get('browser_checkout_timeout', 120)  # Seconds to wait for a free browser
+SECTION_CACHE_TTL = config.get('section_cache_ttl', 600)  # Seconds a parsed section page stays fresh
+SECTION_CACHE_SIZE = config.get('section_cache_size', 64)  # Maximum number of sections kept in memory
+WORKER_COUNT = config.get('worker_count', 4)  # Lookups processed at the same time
+MAX_QUEUE_SIZE = config.get('max_queue_size', 50)  # Lookups allowed to wait for a worker
+LEAN_BROWSER = config.get('lean_browser', True)  # Skip images, CSS and fonts and don't wait for them to load
+WEBHOOK_CONFIG = config.get('webhook')  # Receive updates on a webhook; long polling when unset
+POLLING_BACKOFF_MAX = config.get('polling_backoff_max', 60)  # Longest wait in seconds before polling again
+RUNTIME = config.get('runtime', 'threads')  # "threads" (telebot polling) or "asyncio" (coroutine intake, bounded handler pool)
+ASYNC_WORKERS = config.get('async_workers', 16)  # Handler threads used by the asyncio runtime
+MEMBERSHIP_CACHE_TTL = config.get('membership_cache_ttl', 300)  # Seconds a confirmed channel member is not re-checked
+MEMBERSHIP_NEGATIVE_TTL = config.get('membership_negative_ttl', 30)  # Seconds a non-member answer is reused
+SEND_RATE = config.get('send_rate', 25)  # Outgoing bot messages per second, below Telegram's ~30/s limit
+HTTP_POOL_SIZE = config.get('telegram_http_pool_size', 32)  # Keep-alive connections to the Bot API
+ADMIN_IDS = {int(user_id) for user_id in config.get('admin_ids', [])}  # Telegram user IDs allowed to use /stats
+METRICS_PORT = config.get('metrics_port')  # Serve Prometheus metrics on this port; off when unset
+METRICS_LISTEN = config.get('metrics_listen', '127.0.0.1')  # Address of the metrics endpoint
+PREWARM_CONFIG = config.get('prewarm')  # Pre-fetch popular sections during these windows; off when unset
+
+# Portal URLs
+PORTAL_BASE_URL = config.get('portal_base_url', DEFAULT_BASE_URL)
+ATTENDANCE_URL = urljoin(PORTAL_BASE_URL, PAGE_PATHS["attendance"])
+MID_MARKS_URL = urljoin(PORTAL_BASE_URL, PAGE_PATHS["mid_marks"])
+
+# HTML parser backend: "lxml" (default when installed) or "bs4"
+portal_parser.set_backend(config.get('html_parser', portal_parser.BACKEND))
+
+# Fetch backend per page kind: "selenium" (default) or "http" (falls back to selenium on failure)
+FETCH_BACKENDS = config.get('fetch_backend', {})
 
 # Branch codes mapping based on the dropdown values
 BRANCH_CODES = {
@@ -117,37 +164,65 @@ BRANCH_CODES = {
 # Available sections
 SECTIONS = ["-", "A", "B", "C", "D", "E", "F", "G", "H", "I", "J"]
 
-bot = telebot.TeleBot(API_KEY)
+# Class-selection keyboards of both flows, built once; academic years can be set in config.json
+menu_tree = menus.MenuTree(BRANCH_CODES, SECTIONS, config.get('academic_years', menus.ACADEMIC_YEARS))
+
+# Page kinds used in section cache keys
+ATTENDANCE_PAGE = "attendance"
+MID_MARKS_PAGE = "mid_marks"
+
+section_cache = SectionCache(ttl=SECTION_CACHE_TTL, max_entries=SECTION_CACHE_SIZE)
+
+section_fetches = SingleFlight()  # Concurrent requests for the same section share one fetch
+
+section_demand = SectionDemand()  # Recent lookups per section, used to pick sections to pre-warm
+
+job_scheduler = JobScheduler(workers=WORKER_COUNT, max_queue=MAX_QUEUE_SIZE, name="LookupWorker")
 
-bot_lock = threading.Lock()
+portal_session = PortalSession(login_func=lambda: login_portal())
+portal_client = PortalHttpClient(LOGIN_CREDENTIALS, portal_session, base_url=PORTAL_BASE_URL)
+
+# The asyncio runtime runs handlers on its own bounded pool instead of telebot's threads
+bot = telebot.TeleBot(API_KEY, threaded=RUNTIME != "asyncio")
+
+use_pooled_session(HTTP_POOL_SIZE)
+sender = TelegramSender(rate=SEND_RATE)  # Orders replies per chat and rate-limits them globally
+
+membership_cache = MembershipCache(ttl=MEMBERSHIP_CACHE_TTL, negative_ttl=MEMBERSHIP_NEGATIVE_TTL)
 
 def safe_reply_to(message, text, **kwargs):
-    with bot_lock:
-        try:
-            bot.reply_to(message, text, **kwargs)
-            logging.info(f"Sent message: {text}")
-        except Exception as e:
-            logging.exception(f"Error sending message: {e}")
+    try:
+        sender.call(message.chat.id, bot.reply_to, message, text, **kwargs)
+        logging.info(f"Sent message: {text}")
+    except Exception as e:
+        logging.exception(f"Error sending message: {e}")
 
 def safe_edit_message_text(call, text, **kwargs):
-    with bot_lock:
-        try:
-            bot.edit_message_text(chat_id=call.message.chat.id, message_id=call.message.message_id, text=text, **kwargs)
-            logging.info(f"Edited message: {text}")
-        except Exception as e:
-            logging.exception(f"Error editing message: {e}")
+    try:
+        sender.call(call.message.chat.id, bot.edit_message_text, chat_id=call.message.chat.id,
+                    message_id=call.message.message_id, text=text, **kwargs)
+        logging.info(f"Edited message: {text}")
+    except Exception as e:
+        logging.exception(f"Error editing message: {e}")
 
 def is_user_in_channel(user_id):
+    cached = membership_cache.get(user_id)
+    if cached is not None:
+        return cached
     try:
         member = bot.get_chat_member(chat_id="@nbkrist_helpline", user_id=user_id)
-        return member.status in ["member", "administrator", "creator"]
+        is_member = member.status in ["member", "administrator", "creator"]
     except Exception as e:
         logging.exception(f"Error checking channel membership: {e}")
-        return False
+        return False  # Not cached, the next message asks Telegram again
+    membership_cache.put(user_id, is_member)
+    return is_member
 
 def require_channel_membership(func):
     def wrapper(message, *args, **kwargs):
         user_id = message.from_user.id
+        if (message.text or "").startswith("/start"):
+            membership_cache.invalidate_negative(user_id)  # /start is how users retry after joining
         if not is_user_in_channel(user_id):
             markup = InlineKeyboardMarkup()
             join_button = InlineKeyboardButton("Join Channel", url="https://t.me/nbkrist_helpline")
@@ -162,6 +237,8 @@ def require_channel_membership(func):
 def require_channel_in_callback(func):
     def wrapper(call, *args, **kwargs):
         user_id = call.from_user.id
+        if call.data == "verify_membership":
+            membership_cache.invalidate(user_id)  # The verify button always asks Telegram
         if not is_user_in_channel(user_id):
             markup = InlineKeyboardMarkup()
             join_button = InlineKeyboardButton("Join Channel", url="https://t.me/nbkrist_helpline")
@@ -171,34 +248,35 @@ def require_channel_in_callback(func):
         return func(call, *args, **kwargs)
     return wrapper
 
-@contextmanager
-def open_browser():
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-
-    if not os.path.isfile(CHROME_PATH):
-        raise FileNotFoundError(f"Chrome binary not found at {CHROME_PATH}")
-    if not os.path.isfile(CHROMEDRIVER_PATH):
-        raise FileNotFoundError(f"ChromeDriver not found at {CHROMEDRIVER_PATH}")
+def launch_browser():
+    """Start a new headless Chrome instance."""
+    return new_browser(CHROME_PATH, CHROMEDRIVER_PATH, lean=LEAN_BROWSER)
 
-    chrome_options.binary_location = CHROME_PATH
+def warmup_browser(browser):
+    """Log a freshly launched pooled browser in so requests can skip the login flow."""
+    if navigate_to_attendance_page(browser):
+        ensure_portal_session(browser, ATTENDANCE_URL)
 
-    service = Service(CHROMEDRIVER_PATH)
+browser_pool = BrowserPool(launch_browser, size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES,
+                           warmup=warmup_browser, checkout_timeout=BROWSER_CHECKOUT_TIMEOUT)
+atexit.register(browser_pool.close)
 
-    browser = webdriver.Chrome(service=service, options=chrome_options)
-    try:
-        yield browser
-    except Exception as e:
-        logging.exception(f"Error using browser: {e}")
-    finally:
-        browser.quit()
+@contextmanager
+def open_browser():
+    """Check a warm browser out of the pool for the duration of a request."""
+    started = time.perf_counter()
+    with browser_pool.browser() as browser:
+        tracing.record("browser_checkout", time.perf_counter() - started)  # Includes a launch when no browser was idle
+        try:
+            yield browser
+        except Exception as e:
+            logging.exception(f"Error using browser: {e}")
+            raise
 
+@stage("navigate")
 def navigate_to_attendance_page(browser):
     try:
-        browser.get("http://103.203.175.90:94/attendance/attendanceTillADate.php")
+        browser.get(ATTENDANCE_URL)
         logging.info("Navigated to attendance page.")
         return True
     except Exception as e:
@@ -208,13 +286,11 @@ def navigate_to_attendance_page(browser):
 def login_to_system(browser):
     for cred in LOGIN_CREDENTIALS:
         try:
-            # Explicit wait for page load, increased timeout
-            WebDriverWait(browser, 30).until(EC.presence_of_element_located((By.TAG_NAME, 'body')))
-
             try:
-                username_field = WebDriverWait(browser, 30).until(EC.visibility_of_element_located((By.ID, 'username')))
-                password_field = WebDriverWait(browser, 30).until(EC.visibility_of_element_located((By.ID, 'password')))
-                submit_button = WebDriverWait(browser, 30).until(EC.element_to_be_clickable((By.XPATH, "//form[@name='frmAttLogin']//input[@type='submit']")))
+                # The submit button is the last part of the form to render
+                submit_button = wait_for(browser, "login_form", clickable(By.XPATH, "//form[@name='frmAttLogin']//input[@type='submit']"))
+                username_field = browser.find_element(By.ID, 'username')
+                password_field = browser.find_element(By.ID, 'password')
             except TimeoutException as e:
                 logging.error(f"Timeout waiting for login form elements: {e}")
                 return False
@@ -232,30 +308,19 @@ def login_to_system(browser):
                 return False
 
             logging.info("Login submitted.")
-            #Added loop to check for continue button
-            for i in range(2):  # Changed from 10 to 2 attempts
-                try:
-                    # Attempt to click using link text first
-                    continue_button = WebDriverWait(browser, 5).until(EC.element_to_be_clickable((By.LINK_TEXT, "Continue to Login / Requested Page")))
-                    continue_button.click()
-                    logging.info("Clicked 'Continue to Login' button (link text).")
-                    break  # Exit loop if button is clicked
-                except (TimeoutException, NoSuchElementException) as e:
-                    logging.info(f"Continue to Login button not found (link text) - attempt {i+1}: {e}")
-                    time.sleep(2) # Wait before retrying
-
             try:
-                # Fallback to ID if link text fails after multiple attempts
-                continue_button = WebDriverWait(browser, 10).until(EC.presence_of_element_located((By.ID, "nextPageAnchor")))
+                # One wait for either form of the continue link; no fallback wait once it was clicked
+                continue_button = wait_for(browser, "login_continue", first_present(
+                    (By.LINK_TEXT, "Continue to Login / Requested Page"), (By.ID, "nextPageAnchor")), ceiling=15)
                 continue_button.click()
-                logging.info("Clicked 'Continue to Login' button (ID).")
-            except (TimeoutException, NoSuchElementException) as e:
-                logging.info(f"Continue to Login button not found (ID): {e}")
+                logging.info("Clicked 'Continue to Login' button.")
+            except TimeoutException as e:
+                logging.info(f"Continue to Login button not found: {e}")
             except Exception as e:
                 logging.exception(f"Unexpected error while clicking Continue to Login button: {e}")
 
             try:
-                WebDriverWait(browser, 30).until(EC.presence_of_element_located((By.LINK_TEXT, "Attendance")))
+                wait_for(browser, "login_done", first_present((By.LINK_TEXT, "Attendance")))
                 logging.info("Login successful.")
                 return True
             except TimeoutException as e:
@@ -273,15 +338,62 @@ def login_to_system(browser):
             continue  # Try the next set of credentials
     return False #Login failed with all credentials
 
+def is_login_required(browser):
+    """Check whether the portal is showing the login form instead of the requested page."""
+    try:
+        return "attendanceLogin.php" in browser.current_url or bool(browser.find_elements(By.ID, 'username'))
+    except Exception as e:
+        logging.exception(f"Error checking login state: {e}")
+        return True
+
+def login_portal(browser=None):
+    """Log the bot's portal account in, preferring the cheap HTTP login. Returns the session cookies."""
+    cookies = portal_client.login()
+    if cookies:
+        return cookies
+    if browser is not None and login_to_system(browser):
+        return {cookie['name']: cookie['value'] for cookie in browser.get_cookies()}
+    return None
+
+def apply_portal_cookies(browser, cookies, page_url):
+    """Load the shared session cookies into the browser and reopen page_url."""
+    for name, value in cookies.items():
+        browser.add_cookie({'name': name, 'value': value, 'path': '/'})
+    browser.get(page_url)
+
+@stage("login")
+def ensure_portal_session(browser, page_url):
+    """Make sure the browser is authenticated on page_url, logging in only when the shared session expired."""
+    try:
+        if not is_login_required(browser):
+            return True
+
+        generation, cookies = portal_session.snapshot()
+        if cookies:
+            apply_portal_cookies(browser, cookies, page_url)
+            if not is_login_required(browser):
+                return True
+
+        # Session missing or expired: only one request logs in, the rest reuse its cookies
+        if not portal_session.refresh(generation, login_func=lambda: login_portal(browser)):
+            return False
+        if not is_login_required(browser):  # This browser performed the login itself
+            return True
+
+        _, cookies = portal_session.snapshot()
+        apply_portal_cookies(browser, cookies, page_url)
+        return not is_login_required(browser)
+    except Exception as e:
+        logging.exception(f"Error restoring portal session: {e}")
+        return False
 
+@stage("select_form")
 def select_form_details(browser, academic_year, year_of_study, branch, section):
     """Select form details for mid marks."""
     try:
-        # Wait for the form elements to be present
-        acadYear = WebDriverWait(browser, 30).until(EC.presence_of_element_located((By.NAME, "acadYear")))
-        yearSem = WebDriverWait(browser, 30).until(EC.presence_of_element_located((By.NAME, "yearSem")))
-        branch_select = WebDriverWait(browser, 30).until(EC.presence_of_element_located((By.NAME, "branch")))
-        section_select = WebDriverWait(browser, 30).until(EC.presence_of_element_located((By.NAME, "section")))
+        # One wait for all four selects instead of four consecutive waits
+        acadYear, yearSem, branch_select, section_select = wait_for(browser, "class_form", all_present(
+            (By.NAME, "acadYear"), (By.NAME, "yearSem"), (By.NAME, "branch"), (By.NAME, "section")))
 
         # Select Academic Year (format is already "2024-25")
         Select(acadYear).select_by_value(academic_year)
@@ -301,9 +413,10 @@ def select_form_details(browser, academic_year, year_of_study, branch, section):
         logging.exception(f"Error selecting form details: {e}")
         return False
 
+@stage("show_button")
 def click_show_button(browser):
     try:
-        show_button = WebDriverWait(browser, 30).until(EC.element_to_be_clickable((By.XPATH, "//input[@type='button'][@value='Show']")))
+        show_button = wait_for(browser, "show_button", clickable(By.XPATH, "//input[@type='button'][@value='Show']"))
         show_button.click()
         logging.info("Show button clicked.")
         return True
@@ -311,9 +424,11 @@ def click_show_button(browser):
         logging.exception(f"Error clicking show button: {e}")
         return False
 
-def wait_for_page_load(browser, rollno):
+@stage("page_load")
+def wait_for_page_load(browser):
+    """Wait until the section table's student rows are rendered."""
     try:
-        WebDriverWait(browser, 30).until(EC.presence_of_element_located((By.ID, rollno)))
+        wait_for(browser, "section_rows", first_present(ATTENDANCE_ROW))
         logging.info("Attendance details page loaded.")
         return True
     except Exception as e:
@@ -321,112 +436,93 @@ def wait_for_page_load(browser, rollno):
         return False
 
 def extract_attendance_data(browser, rollno):
-    try:
-        html_content = browser.page_source
-        soup = BeautifulSoup(html_content, 'html.parser')
-        tr_tag = soup.find('tr', {'id': rollno})
-        if not tr_tag:
-            return None
-
-        data = {}
-        try:
-            td_roll_no = tr_tag.find('td', {'class': 'tdRollNo'})
-            data['roll_number'] = td_roll_no.text.strip().replace(' ', '')
-        except AttributeError:
-            data['roll_number'] = "N/A"
-            logging.error("Error: tdRollNo not found.")
+    return extract_attendance_rows(browser.page_source).get(rollno)
+
+def format_attendance_message(data):
+    """Format student attendance data into a readable message."""
+    if not data:
+        return "❌ No attendance data found for this roll number."
+
+    # Create a formatted message with sections and emojis
+    attendance_msg = [
+        "📊 *ATTENDANCE DETAILS*\n",
+        f"🆔 *Roll Number:* {data.get('roll_number', 'N/A')}",
+        f"📈 *Overall Attendance:* {data.get('attendance_percentage', 'N/A')}%",
+        f"📅 *Total Classes:* {data.get('total_classes', 'N/A')}\n",
+        "📚 *Total Presented= Classes&Labs:*"
+    ]
 
-        try:
-            td_percent = tr_tag.find('td', {'class': 'tdPercent'})
-            data['attendance_percentage'] = td_percent.contents[0].strip()
-            font_tag = td_percent.find('font')
-            if font_tag:
-                data['total_classes'] = font_tag.text.strip()
+    # Add subject-wise attendance
+    subject_items = []
+    for key, value in data.items():
+        if key not in ['roll_number', 'attendance_percentage', 'total_classes']:
+            if '(' in key:  # This identifies the labs entry
+                subject_items.append(f"• *{key}:* {value} =labs")
             else:
-                data['total_classes'] = "N/A"
-        except AttributeError:
-            data['attendance_percentage'] = "N/A"
-            data['total_classes'] = "N/A"
-            logging.error("Error: tdPercent not found.")
-
-        subject_data = {td['title']: td.text.strip() for td in tr_tag.find_all('td') if 'title' in td.attrs}
-        data.update(subject_data)
-        return data
+                subject_items.append(f"• *{key}:* {value}")
+
+    # Sort items to ensure labs entry is at the end
+    attendance_msg.extend(sorted(subject_items, key=lambda x: '=' in x))
+
+    return "\n".join(attendance_msg)
+
+def reply_with_attendance(message, rows, rollno):
+    """Pick the student's row out of the section rows and send it."""
+    data = rows.get(rollno)
+    if data is None:
+        safe_reply_to(message, f"❌ Roll number {rollno} not found in the attendance records.")
+        return
+    safe_reply_to(message, format_attendance_message(data), parse_mode='Markdown')
+
+def section_cache_key(academic_year, year_of_study, branch, section, page_kind):
+    branch_code = BRANCH_CODES.get(branch, branch)  # Use the code if branch is a name, otherwise use as is
+    return (academic_year, year_of_study, branch_code, section, page_kind)
+
+def fetch_section_over_http(page_kind, academic_year, year_of_study, branch, section):
+    """Fetch and parse a section with the HTTP backend. Returns None to fall back to Selenium."""
+    if FETCH_BACKENDS.get(page_kind, "selenium") != "http":
+        return None
+    key = section_cache_key(academic_year, year_of_study, branch, section, page_kind)
+    try:
+        with stage("http_fetch"):
+            html_content = portal_client.fetch_section(page_kind, *key[:4])
     except Exception as e:
-        logging.exception(f"Error extracting attendance data: {e}")
+        logging.warning(f"HTTP fetch of {page_kind} page failed, falling back to browser: {e}")
         return None
 
-def process_attendance_details(message, academic_year, year_of_study, branch, section, rollno, browser):
-    try:
-        # Send initial message
-        safe_reply_to(message, "Fetching attendance details...\n\nPlease wait it takes 1min to load")
-        
-        # Navigate to attendance page
-        if not navigate_to_attendance_page(browser):
-            safe_reply_to(message, "Failed to navigate to attendance page.")
-            return
+    with stage("parse"):
+        rows = SECTION_PARSERS[page_kind](html_content)
+    if not rows:
+        logging.warning(f"HTTP {page_kind} page had no student rows, falling back to browser.")
+        return None
+    return rows
 
-        # Login to the system
-        if not login_to_system(browser):
-            safe_reply_to(message, "Failed to login.")
-            return
+def process_attendance_details(browser, academic_year, year_of_study, branch_code, section):
+    """Fetch a whole attendance section with the browser. Returns (rows, error message)."""
+    # Navigate to attendance page
+    if not navigate_to_attendance_page(browser):
+        return None, "Failed to navigate to attendance page."
 
-        # Convert branch name to code
-        branch_code = BRANCH_CODES.get(branch, branch)  # Use the code if branch is a name, otherwise use as is
-        
-        # Select form details
-        if not select_form_details(browser, academic_year, year_of_study, branch_code, section):
-            safe_reply_to(message, "Failed to select form details.")
-            return
-        
-        # Click show button
-        if not click_show_button(browser):
-            safe_reply_to(message, "Failed to click the show button.")
-            return
-        
-        # Wait for page load
-        if not wait_for_page_load(browser, rollno):
-            safe_reply_to(message, f"Failed to load attendance details for roll number {rollno}.")
-            return
+    # Reuse the shared portal session, logging in only if it expired
+    if not ensure_portal_session(browser, ATTENDANCE_URL):
+        return None, "Failed to login."
 
-        # Extract attendance data
-        data = extract_attendance_data(browser, rollno)
-        if data is None:
-            safe_reply_to(message, f"❌ Roll number {rollno} not found in the attendance records.")
-            return
+    # Select form details
+    if not select_form_details(browser, academic_year, year_of_study, branch_code, section):
+        return None, "Failed to select form details."
 
-        if data:
-            # Create a formatted message with sections and emojis
-            attendance_msg = [
-                "📊 *ATTENDANCE DETAILS*\n",
-                f"🆔 *Roll Number:* {data.get('roll_number', 'N/A')}",
-                f"📈 *Overall Attendance:* {data.get('attendance_percentage', 'N/A')}%",
-                f"📅 *Total Classes:* {data.get('total_classes', 'N/A')}\n",
-                "📚 *Total Presented= Classes&Labs:*"
-            ]
-            
-            # Add subject-wise attendance
-            subject_items = []
-            for key, value in data.items():
-                if key not in ['roll_number', 'attendance_percentage', 'total_classes']:
-                    if '(' in key:  # This identifies the labs entry
-                        subject_items.append(f"• *{key}:* {value} =labs")
-                    else:
-                        subject_items.append(f"• *{key}:* {value}")
-            
-            # Sort items to ensure labs entry is at the end
-            attendance_msg.extend(sorted(subject_items, key=lambda x: '=' in x))
-            
-            attendance_info = "\n".join(attendance_msg)
-        else:
-            attendance_info = "❌ No attendance data found for this roll number."
+    # Click show button
+    if not click_show_button(browser):
+        return None, "Failed to click the show button."
 
-        safe_reply_to(message, attendance_info, parse_mode='Markdown')
+    # Wait for page load
+    if not wait_for_page_load(browser):
+        return None, "Failed to load attendance details for this section."
 
-    except Exception as e:
-        logging.exception(f"Error while processing attendance details: {e}")
-        safe_reply_to(message, f"Failed to retrieve attendance details. A detailed error has been logged. Please try again later.")
+    with stage("parse"):
+        return extract_attendance_rows(browser.page_source), None
 
+@stage("navigate")
 def navigate_to_mid_marks_page(browser):
     """Navigate to the mid marks page."""
     try:
@@ -436,97 +532,30 @@ def navigate_to_mid_marks_page(browser):
         logging.exception(f"Error navigating to mid marks page: {e}")
         return False
 
-def get_student_mid_marks(browser, rollno):
-    """Extract mid marks for a specific student."""
+@stage("page_load")
+def wait_for_mid_marks_table(browser):
+    """Wait for the marks table's student rows to be present."""
     try:
-        # Wait for the table to be present
-        WebDriverWait(browser, 10).until(
-            EC.presence_of_element_located((By.TAG_NAME, "table"))
-        )
-        
-        # Get the page source and create BeautifulSoup object
-        html_content = browser.page_source
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Find all tables
-        tables = soup.find_all('table')
-        if not tables:
-            logging.error("No tables found in the page")
-            return None
-            
-        # Get the main marks table (usually the last one)
-        marks_table = tables[-1]
-        
-        # Find the row with the matching roll number
-        student_row = marks_table.find('tr', attrs={'name': rollno}) or marks_table.find('tr', attrs={'id': rollno})
-        if not student_row:
-            logging.error(f"No row found for roll number: {rollno}")
-            return None
-            
-        # Initialize student data
-        student_data = {
-            'roll_number': rollno,
-            'subjects': {},
-            'labs': {}
-        }
-        
-        # Get all cells in the row
-        cells = student_row.find_all('td')
-        
-        # Process each cell that has a name attribute (these are subject cells)
-        for cell in cells:
-            subject_name = cell.get('name', '').strip()
-            if not subject_name:
-                continue
-                
-            cell_text = cell.text.strip()
-            if not cell_text:
-                continue
-                
-            # Initialize marks dictionary
-            marks_dict = {'mid1': '', 'mid2': '', 'total': ''}
-            
-            # Check if it's a lab subject
-            if 'LAB' in subject_name.upper() or 'SKILLS' in subject_name.upper():
-                student_data['labs'][subject_name] = cell_text
-            else:
-                # Extract marks - handle different formats
-                if '/' in cell_text:
-                    # Format: "34/25(33)" or "34/25"
-                    parts = cell_text.split('/')
-                    marks_dict['mid1'] = parts[0].strip()
-                    
-                    second_part = parts[1]
-                    if '(' in second_part:
-                        mid2, total = second_part.split('(')
-                        marks_dict['mid2'] = mid2.strip()
-                        marks_dict['total'] = total.rstrip(')').strip()
-                    else:
-                        marks_dict['mid2'] = second_part.strip()
-                else:
-                    # Single mark format: "16"
-                    marks_dict['mid1'] = cell_text
-                    
-                student_data['subjects'][subject_name] = marks_dict
-        
-        # Get lab marks from the unnamed cells (last few cells)
-        lab_cells = [cell for cell in cells if not cell.get('name') and cell.text.strip()]
-        if len(lab_cells) >= 3:  # Usually last 3 cells contain lab marks
-            student_data['labs'].update({
-                'DW and M LAB': lab_cells[-3].text.strip(),
-                'AI LAB': lab_cells[-2].text.strip(),
-                'COMMUNICATION and SOFT SKILLS': lab_cells[-1].text.strip()
-            })
-        
-        if not student_data['subjects'] and not student_data['labs']:
-            logging.error("No marks found in the row")
-            return None
-            
-        return student_data
-        
+        wait_for(browser, "mid_marks_table", first_present(MID_MARKS_ROW), ceiling=10)
+        return True
     except Exception as e:
-        logging.exception(f"Error extracting student mid marks: {e}")
+        logging.exception(f"Error waiting for mid marks table: {e}")
+        return False
+
+def get_student_mid_marks(browser, rollno):
+    """Extract mid marks for a specific student."""
+    if not wait_for_mid_marks_table(browser):
         return None
+    student_data = extract_mid_marks_rows(browser.page_source).get(rollno)
+    if not student_data:
+        logging.error(f"No row found for roll number: {rollno}")
+    return student_data
+
+# Whole-section parsers for each page kind
+SECTION_PARSERS = {
+    ATTENDANCE_PAGE: extract_attendance_rows,
+    MID_MARKS_PAGE: extract_mid_marks_rows,
+}
 
 def format_mid_marks_message(student_data):
     """Format student mid marks data into a readable message."""
@@ -565,56 +594,146 @@ def format_mid_marks_message(student_data):
     
     return message
 
-def process_mid_marks(message, academic_year, year_of_study, branch, section, rollno):
-    """Process and fetch mid marks for a student."""
-    try:
-        # Send initial message
-        safe_reply_to(message, "Fetching mid marks details...\n\nPlease wait it takes 1min to load")
-        
-        # Navigate to mid marks page
+def reply_with_mid_marks(message, rows, rollno):
+    """Pick the student's row out of the section rows and send it."""
+    student_data = rows.get(rollno)
+    if student_data:
+        safe_reply_to(message, format_mid_marks_message(student_data), parse_mode='Markdown')
+    else:
+        safe_reply_to(message, f"❌ No marks found for roll number {rollno}.")
+
+def process_mid_marks(browser, academic_year, year_of_study, branch_code, section):
+    """Fetch a whole mid marks section with the browser. Returns (rows, error message)."""
+    # Navigate to mid marks page
+    if not navigate_to_mid_marks_page(browser):
+        return None, "Failed to access the mid marks page."
+
+    # Reuse the shared portal session, logging in only if it expired
+    if not ensure_portal_session(browser, MID_MARKS_URL):
+        return None, "Failed to login."
+
+    # Select form details
+    if not select_form_details(browser, academic_year, year_of_study, branch_code, section):
+        return None, "Failed to select form details."
+
+    # Click show button
+    if not click_show_button(browser):
+        return None, "Failed to submit the form."
+
+    if not wait_for_mid_marks_table(browser):
+        return {}, None
+
+    with stage("parse"):
+        return extract_mid_marks_rows(browser.page_source), None
+
+# Browser fetch flow for each page kind
+SECTION_BROWSER_FETCHERS = {
+    ATTENDANCE_PAGE: process_attendance_details,
+    MID_MARKS_PAGE: process_mid_marks,
+}
+
+FETCHING_MESSAGES = {
+    ATTENDANCE_PAGE: "Fetching attendance details...\n\nPlease wait it takes 1min to load",
+    MID_MARKS_PAGE: "Fetching mid marks details...\n\nPlease wait it takes 1min to load",
+}
+
+class SectionFetchError(Exception):
+    """A section page could not be fetched; the message is shown to the user."""
+
+def fetch_section_rows(page_kind, academic_year, year_of_study, branch, section, refresh=False):
+    """Fetch, parse and cache a whole section page, over HTTP if enabled, otherwise with a browser.
+
+    refresh=True fetches even if the section is cached (used to renew it before it expires).
+    """
+    key = section_cache_key(academic_year, year_of_study, branch, section, page_kind)
+    # Filled by a fetch that finished while we were queued; the caller already counted the miss
+    rows = None if refresh else section_cache.peek(key)
+    if rows is not None:
+        return rows
+
+    rows = fetch_section_over_http(page_kind, academic_year, year_of_study, branch, section)
+    if rows is None:
         with open_browser() as browser:
-            if not navigate_to_mid_marks_page(browser):
-                safe_reply_to(message, "Failed to access the mid marks page.")
-                return
-                
-            # Login to the system
-            if not login_to_system(browser):
-                safe_reply_to(message, "Failed to login.")
-                return
-            
-            # Convert branch name to code if needed
-            branch_code = BRANCH_CODES.get(branch, branch)  # Use the code if branch is a name, otherwise use as is
-            
-            # Select form details
-            if not select_form_details(browser, academic_year, year_of_study, branch_code, section):
-                safe_reply_to(message, "Failed to select form details.")
-                return
-            
-            # Click show button
-            if not click_show_button(browser):
-                safe_reply_to(message, "Failed to submit the form.")
-                return
-            
-            # Get student marks
-            student_data = get_student_mid_marks(browser, rollno)
-            if student_data:
-                formatted_message = format_mid_marks_message(student_data)
-                safe_reply_to(message, formatted_message, parse_mode='Markdown')
-            else:
-                safe_reply_to(message, f"❌ No marks found for roll number {rollno}.")
-    
-    except Exception as e:
-        logging.exception(f"Error processing mid marks: {e}")
-        safe_reply_to(message, "An error occurred while fetching mid marks. Please try again.")
+            rows, error = SECTION_BROWSER_FETCHERS[page_kind](browser, *key[:4])
+        if error:
+            raise SectionFetchError(error)
+
+    if rows:
+        section_cache.put(key, rows)
+    return rows
+
+@stage("section")
+def get_section_rows(message, page_kind, academic_year, year_of_study, branch, section):
+    """Return the parsed rows of a section from the cache, or from one fetch shared by all concurrent askers."""
+    key = section_cache_key(academic_year, year_of_study, branch, section, page_kind)
+    section_demand.record(key)
+    rows = section_cache.get(key)
+    if rows is not None:
+        logging.info(f"{page_kind} section {key} served from cache.")
+        return rows
+
+    safe_reply_to(message, FETCHING_MESSAGES[page_kind])
+    return section_fetches.do(key, fetch_section_rows, page_kind, academic_year, year_of_study, branch, section)
+
+def request_id(message):
+    """Trace ID of a lookup: chat and message ID, so it can be matched with the chat."""
+    return f"{message.chat.id}:{message.message_id}"
+
+def prewarm_section(key):
+    """Fetch one section for the pre-warmer, sharing the fetch with students asking for it right now."""
+    academic_year, year_of_study, branch_code, section, page_kind = key
+    return section_fetches.do(key, fetch_section_rows, page_kind, academic_year, year_of_study, branch_code, section, True)
+
+def prewarm_candidates():
+    """Current-year sections by recent lookups, then by stored users in the class."""
+    current_year = menu_tree.academic_years[-1]
+    return popular_sections(section_demand.counts(), class_counts(current_year), current_year,
+                            PREWARM_CONFIG.get('page_kinds', [ATTENDANCE_PAGE, MID_MARKS_PAGE]),
+                            # Leave at least half of the section cache for other sections
+                            min(PREWARM_CONFIG.get('max_sections', 20), SECTION_CACHE_SIZE // 2))
+
+prewarmer = None
+if PREWARM_CONFIG:
+    prewarmer = Prewarmer(prewarm_section, section_cache.age, prewarm_candidates, PREWARM_CONFIG.get('windows', []),
+                          busy=lambda: job_scheduler.stats()["queued"] > 0,  # Students' lookups come first
+                          interval=PREWARM_CONFIG.get('interval', 300),
+                          concurrency=PREWARM_CONFIG.get('concurrency', 1),
+                          pace=PREWARM_CONFIG.get('pace', 5),
+                          refresh_after=SECTION_CACHE_TTL * 0.75)  # Renew warm sections before they expire
 
 def handle_mid_marks_request(message, academic_year, year_of_study, branch, section, rollno):
     """Handle mid marks request in a separate thread."""
+    with tracing.request(MID_MARKS_PAGE, request_id(message)):
+        try:
+            rows = get_section_rows(message, MID_MARKS_PAGE, academic_year, year_of_study, branch, section)
+            with stage("reply"):
+                reply_with_mid_marks(message, rows, rollno)
+            # Remember the user's class so section-specific notices can reach them
+            update_user_fields(str(message.from_user.id), {
+                "marks_academic_year": academic_year,
+                "marks_year_of_study": year_of_study,
+                "marks_branch": BRANCH_CODES.get(branch, branch),
+                "marks_section": section,
+            })
+        except SectionFetchError as e:
+            safe_reply_to(message, str(e))
+        except Exception as e:
+            logging.exception(f"Error in mid marks request: {e}")
+            safe_reply_to(message, "An error occurred while fetching mid marks. Please try again later.")
+
+def schedule_job(message, key, func, *args):
+    """Queue a lookup on the worker pool and tell the user where they are in line."""
     try:
-        with open_browser() as browser:
-            process_mid_marks(message, academic_year, year_of_study, branch, section, rollno)
-    except Exception as e:
-        logging.exception(f"Error in mid marks request: {e}")
-        safe_reply_to(message, "An error occurred while fetching mid marks. Please try again later.")
+        position = job_scheduler.submit(key, func, *args)
+    except DuplicateJob:
+        safe_reply_to(message, "⏳ This request is already in progress. Please wait for the result.")
+        return False
+    except QueueFull:
+        safe_reply_to(message, "⚠️ The bot is very busy right now. Please try again in a minute.")
+        return False
+    if position:
+        safe_reply_to(message, f"⏳ You are #{position} in line. Your request will start shortly.")
+    return True
 
 def process_mid_marks_roll_number(message, academic_year, year_of_study, branch, section):
     """Process roll number input for mid marks."""
@@ -625,9 +744,8 @@ def process_mid_marks_roll_number(message, academic_year, year_of_study, branch,
             return
         
         logging.info(f"User entered roll number: {rollno}")
-        thread = threading.Thread(target=handle_mid_marks_request, 
-                                args=(message, academic_year, year_of_study, branch, section, rollno))
-        thread.start()
+        schedule_job(message, (message.from_user.id, MID_MARKS_PAGE, rollno),
+                     handle_mid_marks_request, message, academic_year, year_of_study, branch, section, rollno)
     except Exception as e:
         logging.exception(f"Error processing roll number: {e}")
         safe_reply_to(message, "An error occurred. Please try again.")
@@ -655,9 +773,7 @@ def send_welcome(message):
     first_name = message.from_user.first_name or "Unknown"
     last_name = message.from_user.last_name or "Unknown"
 
-    update_user_data(str(user_id), "username", user_name)
-    update_user_data(str(user_id), "first_name", first_name)
-    update_user_data(str(user_id), "last_name", last_name)
+    update_user_fields(str(user_id), {"username": user_name, "first_name": first_name, "last_name": last_name})
 
     markup = types.ReplyKeyboardMarkup(resize_keyboard=True)
     markup.add(types.KeyboardButton("📊 Check Attendance"))
@@ -676,20 +792,22 @@ def handle_main_menu(message):
         academic_year_selection_midmarks(message)
 
 def academic_year_selection_attendance(message):
-    markup = types.InlineKeyboardMarkup()
-    markup.add(types.InlineKeyboardButton("2021-22", callback_data="year_2021-22"))
-    markup.add(types.InlineKeyboardButton("2022-23", callback_data="year_2022-23"))
-    markup.add(types.InlineKeyboardButton("2023-24", callback_data="year_2023-24"))
-    markup.add(types.InlineKeyboardButton("2024-25(present-year)", callback_data="year_2024-25"))
-    safe_reply_to(message, "Please select the Academic Year:", reply_markup=markup)
+    prompt, markup = menu_tree.node(menus.ATTENDANCE_FLOW, ())
+    safe_reply_to(message, prompt, reply_markup=markup)
 
 def academic_year_selection_midmarks(message):
-    markup = types.InlineKeyboardMarkup()
-    markup.add(types.InlineKeyboardButton("2021-22", callback_data="mid_year_2021-22"))
-    markup.add(types.InlineKeyboardButton("2022-23", callback_data="mid_year_2022-23"))
-    markup.add(types.InlineKeyboardButton("2023-24", callback_data="mid_year_2023-24"))
-    markup.add(types.InlineKeyboardButton("2024-25(present-year)", callback_data="mid_year_2024-25"))
-    safe_reply_to(message, "Please select the Academic Year:", reply_markup=markup)
+    prompt, markup = menu_tree.node(menus.MID_MARKS_FLOW, ())
+    safe_reply_to(message, prompt, reply_markup=markup)
+
+def handle_menu_selection(call, flow, values):
+    """Show the next class-selection menu, or ask for the roll number once a section is chosen."""
+    if len(values) < menus.DEPTH:
+        prompt, markup = menu_tree.node(flow, values)
+        safe_edit_message_text(call, prompt, reply_markup=markup)
+        return
+    academic_year, year_of_study, branch, section = values
+    safe_edit_message_text(call, f"Selected Section: {section}\nPlease enter your roll number (in uppercase):")
+    bot.register_next_step_handler(call.message, ROLL_NUMBER_HANDLERS[flow], academic_year, year_of_study, branch, section)
 
 @bot.callback_query_handler(func=lambda call: True)
 @require_channel_in_callback
@@ -714,101 +832,9 @@ def callback_query(call):
                 bot.answer_callback_query(call.id, "Please join the channel first!", show_alert=True)
             return
 
-        # Handle attendance flow
-        if call.data.startswith("year_"):
-            academic_year = call.data.split("_")[1]
-            markup = types.InlineKeyboardMarkup()
-            markup.add(types.InlineKeyboardButton("First", callback_data=f"study_{academic_year}_01"))
-            markup.add(types.InlineKeyboardButton("First Yr - First Sem", callback_data=f"study_{academic_year}_11"))
-            markup.add(types.InlineKeyboardButton("First Yr - Second Sem", callback_data=f"study_{academic_year}_12"))
-            markup.add(types.InlineKeyboardButton("Second Yr - First Sem", callback_data=f"study_{academic_year}_21"))
-            markup.add(types.InlineKeyboardButton("Second Yr - Second Sem", callback_data=f"study_{academic_year}_22"))
-            markup.add(types.InlineKeyboardButton("Third Yr - First Sem", callback_data=f"study_{academic_year}_31"))
-            markup.add(types.InlineKeyboardButton("Third Yr - Second Sem", callback_data=f"study_{academic_year}_32"))
-            markup.add(types.InlineKeyboardButton("Final Yr - First Sem", callback_data=f"study_{academic_year}_41"))
-            markup.add(types.InlineKeyboardButton("Final Yr - Second Sem", callback_data=f"study_{academic_year}_42"))
-            safe_edit_message_text(call, f"Selected Academic Year: {academic_year}\nPlease select the Year of Study:", reply_markup=markup)
-
-        elif call.data.startswith("study_"):
-            data = call.data.split("_")
-            academic_year = data[1]
-            year_of_study = data[2]
-            markup = types.InlineKeyboardMarkup()
-            markup.add(types.InlineKeyboardButton("MECH", callback_data=f"branch_{academic_year}_{year_of_study}_7"))
-            markup.add(types.InlineKeyboardButton("CSE", callback_data=f"branch_{academic_year}_{year_of_study}_5"))
-            markup.add(types.InlineKeyboardButton("ECE", callback_data=f"branch_{academic_year}_{year_of_study}_4"))
-            markup.add(types.InlineKeyboardButton("EEE", callback_data=f"branch_{academic_year}_{year_of_study}_2"))
-            markup.add(types.InlineKeyboardButton("CIVIL", callback_data=f"branch_{academic_year}_{year_of_study}_11"))
-            markup.add(types.InlineKeyboardButton("IT", callback_data=f"branch_{academic_year}_{year_of_study}_22"))
-            markup.add(types.InlineKeyboardButton("AI&DS", callback_data=f"branch_{academic_year}_{year_of_study}_23"))
-            safe_edit_message_text(call, f"Selected Year of Study\nPlease select the Branch:", reply_markup=markup)
-
-        elif call.data.startswith("branch_"):
-            data = call.data.split("_")
-            academic_year = data[1]
-            year_of_study = data[2]
-            branch = data[3]
-            markup = types.InlineKeyboardMarkup()
-            for section in ["A", "B", "C", "D", "E", "F", "G", "H", "I", "J"]:
-                markup.add(types.InlineKeyboardButton(section, callback_data=f"section_{academic_year}_{year_of_study}_{branch}_{section}"))
-            safe_edit_message_text(call, f"Selected Branch\nPlease select the Section:", reply_markup=markup)
-
-        elif call.data.startswith("section_"):
-            data = call.data.split("_")
-            academic_year = data[1]
-            year_of_study = data[2]
-            branch = data[3]
-            section = data[4]
-            safe_edit_message_text(call, f"Selected Section: {section}\nPlease enter your roll number (in uppercase):")
-            bot.register_next_step_handler(call.message, process_roll_number, academic_year, year_of_study, branch, section)
-
-        # Handle mid-marks flow
-        elif call.data.startswith("mid_year_"):
-            academic_year = call.data.split("_")[2]
-            markup = types.InlineKeyboardMarkup()
-            markup.add(types.InlineKeyboardButton("First", callback_data=f"mid_study_{academic_year}_01"))
-            markup.add(types.InlineKeyboardButton("First Yr - First Sem", callback_data=f"mid_study_{academic_year}_11"))
-            markup.add(types.InlineKeyboardButton("First Yr - Second Sem", callback_data=f"mid_study_{academic_year}_12"))
-            markup.add(types.InlineKeyboardButton("Second Yr - First Sem", callback_data=f"mid_study_{academic_year}_21"))
-            markup.add(types.InlineKeyboardButton("Second Yr - Second Sem", callback_data=f"mid_study_{academic_year}_22"))
-            markup.add(types.InlineKeyboardButton("Third Yr - First Sem", callback_data=f"mid_study_{academic_year}_31"))
-            markup.add(types.InlineKeyboardButton("Third Yr - Second Sem", callback_data=f"mid_study_{academic_year}_32"))
-            markup.add(types.InlineKeyboardButton("Final Yr - First Sem", callback_data=f"mid_study_{academic_year}_41"))
-            markup.add(types.InlineKeyboardButton("Final Yr - Second Sem", callback_data=f"mid_study_{academic_year}_42"))
-            safe_edit_message_text(call, f"Selected Academic Year: {academic_year}\nPlease select the Year of Study:", reply_markup=markup)
-
-        elif call.data.startswith("mid_study_"):
-            data = call.data.split("_")
-            academic_year = data[2]
-            year_of_study = data[3]
-            markup = types.InlineKeyboardMarkup()
-            markup.add(types.InlineKeyboardButton("MECH", callback_data=f"mid_branch_{academic_year}_{year_of_study}_7"))
-            markup.add(types.InlineKeyboardButton("CSE", callback_data=f"mid_branch_{academic_year}_{year_of_study}_5"))
-            markup.add(types.InlineKeyboardButton("ECE", callback_data=f"mid_branch_{academic_year}_{year_of_study}_4"))
-            markup.add(types.InlineKeyboardButton("EEE", callback_data=f"mid_branch_{academic_year}_{year_of_study}_2"))
-            markup.add(types.InlineKeyboardButton("CIVIL", callback_data=f"mid_branch_{academic_year}_{year_of_study}_11"))
-            markup.add(types.InlineKeyboardButton("IT", callback_data=f"mid_branch_{academic_year}_{year_of_study}_22"))
-            markup.add(types.InlineKeyboardButton("AI&DS", callback_data=f"mid_branch_{academic_year}_{year_of_study}_23"))
-            safe_edit_message_text(call, f"Selected Year of Study\nPlease select the Branch:", reply_markup=markup)
-
-        elif call.data.startswith("mid_branch_"):
-            data = call.data.split("_")
-            academic_year = data[2]
-            year_of_study = data[3]
-            branch = data[4]
-            markup = types.InlineKeyboardMarkup()
-            for section in ["A", "B", "C", "D", "E", "F", "G", "H", "I", "J"]:
-                markup.add(types.InlineKeyboardButton(section, callback_data=f"mid_section_{academic_year}_{year_of_study}_{branch}_{section}"))
-            safe_edit_message_text(call, f"Selected Branch\nPlease select the Section:", reply_markup=markup)
-
-        elif call.data.startswith("mid_section_"):
-            data = call.data.split("_")
-            academic_year = data[2]
-            year_of_study = data[3]
-            branch = data[4]
-            section = data[5]
-            safe_edit_message_text(call, f"Selected Section: {section}\nPlease enter your roll number (in uppercase):")
-            bot.register_next_step_handler(call.message, process_mid_marks_roll_number, academic_year, year_of_study, branch, section)
+        menu = menus.parse(call.data)
+        if menu:
+            handle_menu_selection(call, *menu)
 
         # Handle enter_credentials callback
         elif call.data == "enter_credentials":
@@ -824,47 +850,34 @@ def callback_query(call):
 def process_roll_number(message, academic_year, year_of_study, branch, section):
     rollno = message.text.strip().upper()
     logging.info(f"User entered roll number: {rollno}")
-    user_thread = threading.Thread(target=handle_user_request, args=(message, academic_year, year_of_study, branch, section, rollno))
-    user_thread.start()
+    schedule_job(message, (message.from_user.id, ATTENDANCE_PAGE, rollno),
+                 handle_user_request, message, academic_year, year_of_study, branch, section, rollno)
+
+# Roll number step that follows a completed class selection in each menu flow
+ROLL_NUMBER_HANDLERS = {
+    menus.ATTENDANCE_FLOW: process_roll_number,
+    menus.MID_MARKS_FLOW: process_mid_marks_roll_number,
+}
 
 def handle_user_request(message, academic_year, year_of_study, branch, section, rollno):
-    try:
-        with open_browser() as browser:
-            process_attendance_details(message, academic_year, year_of_study, branch, section, rollno, browser)
-    except Exception as e:
-        logging.exception(f"Error handling user request: {e}")
-        safe_reply_to(message, f"An error occurred while processing your request. Please try again later.  A detailed error has been logged.")
+    with tracing.request(ATTENDANCE_PAGE, request_id(message)):
+        try:
+            rows = get_section_rows(message, ATTENDANCE_PAGE, academic_year, year_of_study, branch, section)
+            with stage("reply"):
+                reply_with_attendance(message, rows, rollno)
+        except SectionFetchError as e:
+            safe_reply_to(message, str(e))
+        except Exception as e:
+            logging.exception(f"Error handling user request: {e}")
+            safe_reply_to(message, f"Failed to retrieve attendance details. A detailed error has been logged. Please try again later.")
 
 def verify_login(username, password):
     """Verify login credentials using Selenium."""
     logging.info(f"Starting login verification for username: {username}")
     browser = None
     try:
-        chrome_options = Options()
-        chrome_options.add_argument('--headless=new')  # Enable headless mode
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')  # Required for headless
-        chrome_options.add_argument('--disable-software-rasterizer')
-        chrome_options.add_argument('--disable-extensions')
-        chrome_options.add_argument('--disable-logging')
-        chrome_options.add_argument('--log-level=3')
-        chrome_options.add_argument('--silent')
-        
-        # Performance optimizations
-        chrome_options.add_argument('--disable-dev-tools')
-        chrome_options.add_argument('--no-default-browser-check')
-        chrome_options.add_argument('--no-first-run')
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
-        
-        service = Service(executable_path=CHROMEDRIVER_PATH)
-        service.log_path = os.devnull  # Disable service logging
-        
-        browser = webdriver.Chrome(service=service, options=chrome_options)
-        browser.set_page_load_timeout(15)  # Reduced timeout
-        
+        browser = new_browser(CHROME_PATH, CHROMEDRIVER_PATH, lean=LEAN_BROWSER, page_load_timeout=15)
+
         url = "http://103.203.175.90:94/attendance/attendanceLogin.php"
         logging.info(f"Navigating to URL: {url}")
         browser.get(url)
@@ -1082,12 +1095,14 @@ def handle_credentials(message):
         
         status_message = bot.reply_to(message, "🔄 Verifying your credentials... Please wait.")
         
-        # Start verification in a separate thread
-        thread = threading.Thread(
-            target=handle_verification,
-            args=(message, username, password, status_message)
-        )
-        thread.start()
+        # Run verification on the shared worker pool
+        if not schedule_job(message, (user_id, "verification"),
+                            handle_verification, message, username, password, status_message):
+            # schedule_job already said why; don't leave "Verifying..." hanging
+            try:
+                bot.delete_message(status_message.chat.id, status_message.message_id)
+            except Exception as e:
+                logging.error(f"Error deleting verification status message: {e}")
 
 @bot.message_handler(func=lambda message: message.text == "‼️ REPORT ERROR")
 def report_error_handler(message):
@@ -1115,13 +1130,127 @@ THANK YOU FOR USING THIS BOT
         parse_mode='HTML'
     )
 
-def run_bot():
+def component_stats():
+    """{component: {counter: value}} of the bot's queues, caches and portal session."""
+    return {
+        "jobs": job_scheduler.stats(),
+        "section_cache": section_cache.stats(),
+        "section_fetches": section_fetches.stats(),
+        "membership_cache": membership_cache.stats(),
+        "sender": sender.stats(),
+        "portal": {"logins": portal_session.logins},
+        **({"prewarm": prewarmer.stats()} if prewarmer else {}),
+    }
+
+def metric_gauges():
+    """Numeric component counters as Prometheus gauges, e.g. nbkrist_jobs_queued."""
+    return {f"nbkrist_{component}_{name}": value
+            for component, counters in component_stats().items()
+            for name, value in counters.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)}
+
+def format_stats_message():
+    lines = ["📈 *Lookup stats* (seconds, last 500 per stage)", "```"]
+    lines.append(f"{'stage':<16} {'n':>5} {'p50':>7} {'p95':>7} {'p99':>7}")
+    for page_kind, stages in tracing.stats().items():
+        lines.append(f"[{page_kind}]")
+        for name, entry in stages.items():
+            lines.append(f"{name:<16} {entry['count']:>5} {entry.get('p50', 0):>7.2f} "
+                         f"{entry.get('p95', 0):>7.2f} {entry.get('p99', 0):>7.2f}")
+    lines.append("```")
+
+    slow = tracing.slowest()
+    if slow:
+        lines.append("🐢 *Slowest recent requests:*\n```")
+        for trace in slow:
+            stages = ", ".join(f"{name} {seconds:.2f}" for name, seconds in trace["stages"])
+            lines.append(f"{trace['id']} {trace['page_kind']} {trace['elapsed']:.2f}s: {stages}")
+        lines.append("```")
+
+    waits = readiness.stats()
+    if waits:
+        lines.append("⏱ *Browser waits:*\n```")
+        for name, entry in waits.items():
+            lines.append(f"{name:<16} p50 {entry['p50']} timeout {entry['timeout']} timeouts {entry['timeouts']} extended {entry['extended']}")
+        lines.append("```")
+
+    lines.append("⚙️ *Components:*\n```")
+    for component, counters in component_stats().items():
+        values = " ".join(f"{name}={value:.2f}" if isinstance(value, float) else f"{name}={value}"
+                          for name, value in counters.items())
+        lines.append(f"{component}: {values}")
+    lines.append("```")
+    return "\n".join(lines)
+
+@bot.message_handler(commands=['stats'], func=lambda message: message.from_user.id in ADMIN_IDS)
+def stats_handler(message):
+    """Admin-only report of per-stage latencies and component counters."""
+    safe_reply_to(message, format_stats_message(), parse_mode='Markdown')
+
+@bot.message_handler(commands=['prewarm'], func=lambda message: message.from_user.id in ADMIN_IDS)
+def prewarm_handler(message):
+    """Admin-only: pre-warm popular sections now, e.g. right after the portal was updated."""
+    if prewarmer is None:
+        safe_reply_to(message, "Pre-warming is not configured (add a \"prewarm\" block to config.json).")
+        return
+    prewarmer.trigger()
+    safe_reply_to(message, "🔥 Pre-warming popular sections now.")
+
+def run_webhook():
+    """Serve updates over the webhook until SIGINT/SIGTERM. Returns False if it could not start."""
+    try:
+        server = WebhookServer(bot, workers=ASYNC_WORKERS, **WEBHOOK_CONFIG)
+        server.register()
+    except Exception as e:
+        logging.exception(f"Could not start webhook mode, falling back to polling: {e}")
+        return False
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda signum, frame: stop.set())
+    server.start()
+    while not stop.wait(1):
+        pass
+    logging.info("Shutting down webhook server")
+    server.stop()
+    return True
+
+def run_polling():
+    """Long-poll for updates, retrying with exponential backoff after failures."""
+    backoff = 1
     while True:
+        started = time.monotonic()
         try:
             bot.polling(none_stop=True)
+            return
+        except Exception as e:
+            if time.monotonic() - started > POLLING_BACKOFF_MAX:
+                backoff = 1  # Polling worked for a while, so this is a fresh failure
+            logging.exception(f"Bot polling failed, retrying in {backoff}s: {e}")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, POLLING_BACKOFF_MAX)
+
+def run_bot():
+    threading.Thread(target=browser_pool.prefill, name="BrowserPoolPrefill", daemon=True).start()
+    job_scheduler.start()
+    if prewarmer:
+        prewarmer.start()
+    if METRICS_PORT:
+        try:
+            MetricsServer(METRICS_PORT, listen=METRICS_LISTEN, gauges=metric_gauges).start()
+        except OSError as e:
+            logging.exception(f"Could not start the metrics endpoint: {e}")
+    if WEBHOOK_CONFIG:
+        if run_webhook():
+            return
+        try:
+            bot.remove_webhook()  # Telegram refuses getUpdates while a webhook is set
         except Exception as e:
-            logging.exception(f"Bot polling failed: {e}")
-            time.sleep(30)
+            logging.exception(f"Could not remove the webhook: {e}")
+    if RUNTIME == "asyncio":
+        asyncio.run(AsyncRuntime(bot, workers=ASYNC_WORKERS, backoff_max=POLLING_BACKOFF_MAX).run())
+        return
+    run_polling()
 
 if __name__ == "__main__":
     run_bot()
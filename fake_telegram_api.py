@@ -0,0 +1,143 @@
+"""Local stand-in for the Telegram Bot API, for offline dry runs and benchmarks.
+
+Point telebot at it with ``telebot.apihelper.API_URL = server.api_url``.
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # Bursts of concurrent connections are queued, not dropped
+
+
+class FakeTelegramAPI:
+    """Threaded HTTP server answering the Bot API methods the bot uses.
+
+    ``latency`` simulates network round trips, ``flood_every`` answers every
+    Nth send with a 429 and ``blocked_chats`` answers with 403 for those chats.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, flood_every=0, retry_after=1, blocked_chats=()):
+        self.latency = latency
+        self.flood_every = flood_every
+        self.retry_after = retry_after
+        self.blocked_chats = {str(chat_id) for chat_id in blocked_chats}
+        self.calls = []  # (method, params) of every request
+        self.updates = []  # Queued updates returned by getUpdates
+        self._lock = threading.Lock()
+        self._message_ids = itertools.count(1)
+        self._sends = itertools.count(1)
+        self.server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def api_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/bot{{0}}/{{1}}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="FakeTelegramAPI", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, method):
+        with self._lock:
+            return sum(1 for name, _ in self.calls if name == method)
+
+    def _message(self, chat_id, params, photo=None):
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id) if str(chat_id).lstrip("-").isdigit() else 0, "type": "private"},
+        }
+        if photo is not None:
+            message["photo"] = [{"file_id": photo, "file_unique_id": photo[-16:], "width": 800, "height": 600}]
+            if params.get("caption"):
+                message["caption"] = params["caption"]
+        else:
+            message["text"] = params.get("text", "")
+        return message
+
+    def handle(self, method, params, body):
+        """Return (status, response JSON) for one API call."""
+        with self._lock:
+            self.calls.append((method, params))
+        if self.latency:
+            time.sleep(self.latency)
+
+        if method == "getMe":
+            return 200, {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}}
+        if method == "getUpdates":
+            with self._lock:
+                updates, self.updates = self.updates, []
+            return 200, {"ok": True, "result": updates}
+        if method in ("deleteWebhook", "setWebhook", "answerCallbackQuery", "deleteMessage"):
+            return 200, {"ok": True, "result": True}
+        if method == "getChatMember":
+            return 200, {"ok": True, "result": {"status": "member", "user": {"id": int(params.get("user_id", 0)), "is_bot": False, "first_name": "User"}}}
+
+        chat_id = params.get("chat_id", "")
+        if method in ("sendMessage", "sendPhoto", "editMessageText"):
+            if chat_id in self.blocked_chats:
+                return 403, {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+            if self.flood_every and next(self._sends) % self.flood_every == 0:
+                return 429, {"ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {self.retry_after}",
+                             "parameters": {"retry_after": self.retry_after}}
+            photo = None
+            if method == "sendPhoto":
+                # Re-sent file_ids come back unchanged; uploads get a new id
+                photo = params.get("photo") or f"fake-file-{len(body)}-{next(self._message_ids)}"
+            return 200, {"ok": True, "result": self._message(chat_id, params, photo)}
+
+        return 404, {"ok": False, "error_code": 404, "description": "Not Found: method not found"}
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _respond(self):
+                url = urlparse(self.path)
+                method = url.path.rsplit("/", 1)[-1]
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if body and self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+                    params.update({key: values[-1] for key, values in parse_qs(body.decode()).items()})
+                status, payload = api.handle(method, params, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _respond
+            do_POST = _respond
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Telegram Bot API server.")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every call")
+    parser.add_argument("--flood-every", type=int, default=0, help="Answer every Nth send with 429")
+    args = parser.parse_args()
+    api = FakeTelegramAPI(port=args.port, latency=args.latency, flood_every=args.flood_every)
+    print(f"Fake Telegram API listening, set telebot.apihelper.API_URL = {api.api_url!r}")
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        api.stop()
@@ -0,0 +1,91 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+
+class QueueFull(Exception):
+    """The job queue is at capacity."""
+
+
+class DuplicateJob(Exception):
+    """The same job is already queued or running."""
+
+
+class JobScheduler:
+    """Fixed pool of worker threads fed by a bounded queue.
+
+    Jobs are submitted with a dedup key (e.g. user id + lookup) so one user
+    cannot queue the same lookup twice while it is still pending or running.
+    """
+
+    def __init__(self, workers=4, max_queue=50, name="Worker"):
+        self.workers = max(1, int(workers))
+        self.name = name
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._keys = set()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._active = 0
+        self._waits = deque(maxlen=200)  # Recent queue wait times in seconds
+        self.completed = 0
+        self.rejected = 0
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"{self.name}-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, key, func, *args):
+        """Queue func(*args). Returns its place in line: 0 if a worker is free, else 1 for next up, 2, ..."""
+        with self._lock:
+            if key in self._keys:
+                raise DuplicateJob(key)
+            try:
+                self._queue.put_nowait((key, time.time(), func, args))
+            except queue.Full:
+                self.rejected += 1
+                raise QueueFull()
+            self._keys.add(key)
+            self._pending += 1
+            position = max(0, self._pending + self._active - self.workers)
+        logging.info(f"Queued job {key}: #{position} in line, {self._pending} pending, {self._active} running.")
+        return position
+
+    def _worker(self):
+        while True:
+            key, enqueued_at, func, args = self._queue.get()
+            wait = time.time() - enqueued_at
+            with self._lock:
+                self._pending -= 1
+                self._active += 1
+                self._waits.append(wait)
+            logging.info(f"Started job {key} after {wait:.2f}s in queue.")
+            try:
+                func(*args)
+            except Exception as e:
+                logging.exception(f"Unhandled error in job {key}: {e}")
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._keys.discard(key)
+                    self.completed += 1
+                self._queue.task_done()
+
+    def stats(self):
+        """Queue depth, worker usage and recent wait times for monitoring."""
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "workers": self.workers,
+                "active": self._active,
+                "queued": self._pending,
+                "capacity": self._queue.maxsize,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait": sum(waits) / len(waits) if waits else 0.0,
+                "max_wait": waits[-1] if waits else 0.0,
+            }
@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class MembershipCache:
+    """Thread-safe TTL cache of channel membership checks.
+
+    Members are remembered for ``ttl`` seconds and non-members for the
+    shorter ``negative_ttl``, so someone who just joined is let in soon even
+    without pressing the verify button. The least recently used users are
+    evicted beyond ``max_entries``.
+    """
+
+    def __init__(self, ttl=300, negative_ttl=30, max_entries=10000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max(1, int(max_entries))
+        self._entries = OrderedDict()  # user_id -> (expires_at, is_member)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """Return True/False if a fresh answer is cached, otherwise None."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(user_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user_id, is_member):
+        ttl = self.ttl if is_member else self.negative_ttl
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + ttl, is_member)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id=None):
+        """Forget one user, or everyone when user_id is None."""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def invalidate_negative(self, user_id):
+        """Forget a user only if they were cached as a non-member."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and not entry[1]:
+                del self._entries[user_id]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,127 @@
+"""Declarative class-selection menus for the attendance and mid marks flows.
+
+Both flows walk academic year -> year of study -> branch -> section. Every
+keyboard of both flows is built once at startup and stored as ready-to-send
+JSON, so a button tap is one parse and one dict lookup.
+
+callback_data is ``<flow>:<value>:<value>...``, e.g. ``a:2024-25:31:5:C``:
+the flow letter followed by the values chosen so far.
+"""
+from telebot import types
+
+ATTENDANCE_FLOW = "a"
+MID_MARKS_FLOW = "m"
+FLOWS = (ATTENDANCE_FLOW, MID_MARKS_FLOW)
+
+# Academic years offered, oldest first; the last one is labelled as the present year
+ACADEMIC_YEARS = ["2021-22", "2022-23", "2023-24", "2024-25"]
+
+# (portal value, button label)
+YEARS_OF_STUDY = [
+    ("01", "First"),
+    ("11", "First Yr - First Sem"),
+    ("12", "First Yr - Second Sem"),
+    ("21", "Second Yr - First Sem"),
+    ("22", "Second Yr - Second Sem"),
+    ("31", "Third Yr - First Sem"),
+    ("32", "Third Yr - Second Sem"),
+    ("41", "Final Yr - First Sem"),
+    ("42", "Final Yr - Second Sem"),
+]
+
+# (BRANCH_CODES name, button label) of the branches shown in the menu
+MENU_BRANCHES = [
+    ("MECH", "MECH"),
+    ("CSE", "CSE"),
+    ("ECE", "ECE"),
+    ("EEE", "EEE"),
+    ("CIVIL", "CIVIL"),
+    ("IT", "IT"),
+    ("AI_DS", "AI&DS"),
+]
+
+# Text shown above the keyboard once `depth` values have been chosen
+PROMPTS = {
+    0: "Please select the Academic Year:",
+    1: "Selected Academic Year: {0}\nPlease select the Year of Study:",
+    2: "Selected Year of Study\nPlease select the Branch:",
+    3: "Selected Branch\nPlease select the Section:",
+}
+DEPTH = 4  # Values in a complete selection: year, year of study, branch, section
+
+# Callback prefixes used before the compact encoding; buttons in old chats still carry them
+LEGACY_PREFIXES = [
+    ("mid_section_", MID_MARKS_FLOW), ("mid_branch_", MID_MARKS_FLOW),
+    ("mid_study_", MID_MARKS_FLOW), ("mid_year_", MID_MARKS_FLOW),
+    ("section_", ATTENDANCE_FLOW), ("branch_", ATTENDANCE_FLOW),
+    ("study_", ATTENDANCE_FLOW), ("year_", ATTENDANCE_FLOW),
+]
+
+
+def encode(flow, values):
+    return ":".join([flow, *values])
+
+
+def parse(data):
+    """Return (flow, values) for a menu button's callback_data, or None for other buttons."""
+    if not data:
+        return None
+    flow, separator, rest = data.partition(":")
+    if separator and flow in FLOWS:
+        values = rest.split(":")
+        return (flow, values) if len(values) <= DEPTH else None
+    for prefix, legacy_flow in LEGACY_PREFIXES:
+        if data.startswith(prefix):
+            return legacy_flow, data[len(prefix):].split("_")[:DEPTH]
+    return None
+
+
+class MenuTree:
+    """All class-selection keyboards, precomputed as (prompt, reply_markup JSON)."""
+
+    def __init__(self, branch_codes, sections, academic_years=ACADEMIC_YEARS):
+        self.academic_years = list(academic_years)
+        self.branches = [(branch_codes[name], label) for name, label in MENU_BRANCHES if name in branch_codes]
+        self.sections = [section for section in sections if section != "-"]
+        self._nodes = {}
+        for flow in FLOWS:
+            self._build(flow, ())
+
+    def _options(self, depth):
+        """(value, label) pairs offered after `depth` values have been chosen."""
+        if depth == 0:
+            last = len(self.academic_years) - 1
+            return [(year, f"{year}(present-year)" if index == last else year)
+                    for index, year in enumerate(self.academic_years)]
+        if depth == 1:
+            return YEARS_OF_STUDY
+        if depth == 2:
+            return self.branches
+        return [(section, section) for section in self.sections]
+
+    def _node(self, flow, values):
+        options = self._options(len(values))
+        markup = types.InlineKeyboardMarkup()
+        for value, label in options:
+            markup.add(types.InlineKeyboardButton(label, callback_data=encode(flow, (*values, value))))
+        # telebot sends a JSON string reply_markup as is, so it is serialized only once
+        return PROMPTS[len(values)].format(*values), markup.to_json(), [value for value, _ in options]
+
+    def _build(self, flow, values):
+        prompt, markup, children = self._node(flow, values)
+        self._nodes[(flow, *values)] = (prompt, markup)
+        if len(values) + 1 < DEPTH:
+            for value in children:
+                self._build(flow, (*values, value))
+
+    def node(self, flow, values):
+        """Return (prompt, reply_markup) to show after `values` were chosen in `flow`."""
+        key = (flow, *values)
+        if key in self._nodes:
+            return self._nodes[key]
+        # A button from an older menu (e.g. a removed academic year): build it without caching
+        prompt, markup, _ = self._node(flow, tuple(values))
+        return prompt, markup
+
+    def __len__(self):
+        return len(self._nodes)
@@ -0,0 +1,157 @@
+import logging
+import threading
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = "http://103.203.175.90:94"
+LOGIN_PATH = "/attendance/attendanceLogin.php"
+
+# Only on the page the portal shows after a successful login (the "Continue to
+# Login / Requested Page" link, or the menu once it has been followed)
+LOGGED_IN_MARKERS = ("nextPageAnchor", "Continue to Login / Requested Page", ">Attendance</a>")
+
+# Form pages for each page kind (same pages the Selenium flow drives)
+PAGE_PATHS = {
+    "attendance": "/attendance/attendanceTillADate.php",
+    "mid_marks": "/mid_marks/classSelectionForMarksDisplay.php",
+}
+
+
+class PortalResponseError(Exception):
+    """The portal answered with something that does not look like the expected page."""
+
+
+def is_login_page(response):
+    """Check whether a response is the portal's login form."""
+    return "attendanceLogin.php" in response.url or "frmAttLogin" in response.text
+
+
+def is_logged_in_page(response):
+    """Check whether a response is a page the portal only shows after a successful login."""
+    return response.ok and "frmAttLogin" not in response.text and any(
+        marker in response.text for marker in LOGGED_IN_MARKERS)
+
+
+def form_fields(form):
+    """Collect the default values of a form's inputs and selects."""
+    fields = {}
+    for tag in form.find_all(["input", "select"]):
+        name = tag.get("name")
+        if not name or tag.get("type") in ("submit", "button", "reset"):
+            continue
+        if tag.name == "select":
+            option = tag.find("option", selected=True) or tag.find("option")
+            fields[name] = option.get("value", "") if option else ""
+        else:
+            fields[name] = tag.get("value", "")
+    return fields
+
+
+class PortalHttpClient:
+    """Fetch portal section pages with plain HTTP instead of a browser.
+
+    Every thread has its own ``requests.Session`` (all sharing one connection
+    pool) holding a copy of the shared ``PortalSession`` cookies, so a login
+    never changes the cookies under a fetch in progress. The client only asks
+    the PortalSession to log in again when the portal answers with the login
+    form.
+    """
+
+    def __init__(self, credentials, portal_session, base_url=DEFAULT_BASE_URL, pool_size=10, timeout=15):
+        self.credentials = credentials
+        self.portal_session = portal_session
+        self.base_url = base_url
+        self.timeout = timeout
+        self.adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self._local = threading.local()
+
+    def url(self, path):
+        return urljoin(self.base_url, path)
+
+    def _new_session(self):
+        session = requests.Session()
+        session.mount("http://", self.adapter)
+        session.mount("https://", self.adapter)
+        return session
+
+    def login(self):
+        """Log in with the first working credentials. Returns the session cookies, or None."""
+        for cred in self.credentials:
+            session = self._new_session()  # Published only once the login is known to work
+            try:
+                response = session.get(self.url(LOGIN_PATH), timeout=self.timeout)
+                soup = BeautifulSoup(response.text, "html.parser")
+                form = soup.find("form", attrs={"name": "frmAttLogin"})
+                data = form_fields(form) if form else {}
+                data["username"] = cred["username"]
+                data["password"] = cred["password"]
+                action = form.get("action") if form else None
+                response = session.post(urljoin(response.url, action or LOGIN_PATH), data=data, timeout=self.timeout)
+                if is_logged_in_page(response):  # The login response itself lives on attendanceLogin.php
+                    logging.info("Logged in to portal over HTTP.")
+                    return session.cookies.get_dict()
+                if not response.ok:
+                    logging.error(f"HTTP login for {cred['username']} got status {response.status_code}")
+                else:
+                    logging.warning(f"HTTP login rejected for {cred['username']}")
+            except requests.RequestException as e:
+                logging.error(f"HTTP login error for {cred['username']}: {e}")
+            finally:
+                session.close()
+        return None
+
+    def _use_shared_cookies(self):
+        """This thread's session, loaded with the shared cookies if they changed. Returns (session, generation)."""
+        generation, cookies = self.portal_session.snapshot()
+        if not cookies:
+            if not self.portal_session.refresh(generation):
+                raise PortalResponseError("Login failed")
+            generation, cookies = self.portal_session.snapshot()
+        local = self._local
+        if getattr(local, "session", None) is None:
+            local.session = self._new_session()
+            local.generation = None
+        if generation != local.generation:
+            local.session.cookies.clear()
+            local.session.cookies.update(cookies)
+            local.generation = generation
+        return local.session, generation
+
+    def fetch_section(self, page_kind, academic_year, year_of_study, branch_code, section):
+        """Post the class selection form and return the section page HTML."""
+        form_data = {
+            "acadYear": academic_year,
+            "yearSem": year_of_study,
+            "branch": branch_code,
+            "section": section,
+        }
+        for attempt in range(2):
+            session, generation = self._use_shared_cookies()
+            page_url = self.url(PAGE_PATHS[page_kind])
+            response = session.get(page_url, timeout=self.timeout)
+            response.raise_for_status()
+            if is_login_page(response):
+                if attempt == 0 and self.portal_session.refresh(generation):
+                    continue
+                raise PortalResponseError("Session expired and login failed")
+
+            soup = BeautifulSoup(response.text, "html.parser")
+            select = soup.find("select", attrs={"name": "acadYear"})
+            form = select.find_parent("form") if select else None
+            if form is None:
+                raise PortalResponseError(f"Class selection form not found on {page_kind} page")
+
+            data = form_fields(form)
+            data.update(form_data)
+            action = urljoin(response.url, form.get("action") or page_url)
+            response = session.post(action, data=data, timeout=self.timeout)
+            response.raise_for_status()
+            if is_login_page(response):
+                if attempt == 0 and self.portal_session.refresh(generation):
+                    continue
+                raise PortalResponseError("Session expired and login failed")
+            return response.text
+        raise PortalResponseError("Could not fetch section page")
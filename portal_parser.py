@@ -0,0 +1,249 @@
+import logging
+
+from bs4 import BeautifulSoup, Comment, NavigableString
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # lxml is optional; fall back to BeautifulSoup
+    lxml = None
+
+# Parser backend used by extract_attendance_rows / extract_mid_marks_rows
+BACKEND = "lxml" if lxml else "bs4"
+
+
+def set_backend(name):
+    """Select the parser backend ("lxml" or "bs4")."""
+    global BACKEND
+    if name == "lxml" and lxml is None:
+        logging.warning("lxml is not installed, using the bs4 parser backend.")
+        name = "bs4"
+    if name not in ATTENDANCE_PARSERS:
+        raise ValueError(f"Unknown parser backend: {name}")
+    BACKEND = name
+
+
+def build_mid_marks_data(rollno, cells):
+    """Build the student data dict from a row's (name, text) cells."""
+    # Initialize student data
+    student_data = {
+        'roll_number': rollno,
+        'subjects': {},
+        'labs': {}
+    }
+
+    # Process each cell that has a name attribute (these are subject cells)
+    for subject_name, cell_text in cells:
+        if not subject_name or not cell_text:
+            continue
+
+        # Initialize marks dictionary
+        marks_dict = {'mid1': '', 'mid2': '', 'total': ''}
+
+        # Check if it's a lab subject
+        if 'LAB' in subject_name.upper() or 'SKILLS' in subject_name.upper():
+            student_data['labs'][subject_name] = cell_text
+        else:
+            # Extract marks - handle different formats
+            if '/' in cell_text:
+                # Format: "34/25(33)" or "34/25"
+                parts = cell_text.split('/')
+                marks_dict['mid1'] = parts[0].strip()
+
+                second_part = parts[1]
+                if '(' in second_part:
+                    mid2, total = second_part.split('(')
+                    marks_dict['mid2'] = mid2.strip()
+                    marks_dict['total'] = total.rstrip(')').strip()
+                else:
+                    marks_dict['mid2'] = second_part.strip()
+            else:
+                # Single mark format: "16"
+                marks_dict['mid1'] = cell_text
+
+            student_data['subjects'][subject_name] = marks_dict
+
+    # Get lab marks from the unnamed cells (last few cells)
+    lab_cells = [cell_text for subject_name, cell_text in cells if not subject_name and cell_text]
+    if len(lab_cells) >= 3:  # Usually last 3 cells contain lab marks
+        student_data['labs'].update({
+            'DW and M LAB': lab_cells[-3],
+            'AI LAB': lab_cells[-2],
+            'COMMUNICATION and SOFT SKILLS': lab_cells[-1]
+        })
+
+    if not student_data['subjects'] and not student_data['labs']:
+        logging.info(f"No marks found in the row for roll number: {rollno}")
+        return None
+
+    return student_data
+
+
+def collect_attendance_rows(id_rows, parse_row):
+    """Parse (id, row) pairs with parse_row, keyed by id. A row that fails to parse is logged and skipped."""
+    rows = {}
+    for row_id, row in id_rows:
+        try:
+            rows[row_id] = parse_row(row)
+        except Exception as e:
+            logging.exception(f"Skipping attendance row {row_id}: {e}")
+    return rows
+
+
+def collect_mid_marks_rows(row_cells):
+    """Key mid marks rows by name, falling back to id. row_cells yields (name, id, cells).
+
+    A row that fails to parse is logged and skipped, so one bad row does not
+    cost the rest of the section its results.
+    """
+    rows = {}
+    for name, row_id, cells in row_cells:
+        for rollno in (name, row_id):
+            if rollno and rollno not in rows:
+                try:
+                    student_data = build_mid_marks_data(rollno, cells)
+                except Exception as e:
+                    logging.exception(f"Skipping mid marks row {rollno}: {e}")
+                    break
+                if student_data:
+                    rows[rollno] = student_data
+    return rows
+
+
+# --- BeautifulSoup backend (reference implementation) ---
+
+def leading_text(tag):
+    """Text before the tag's first child element, like lxml's ``element.text`` ('' if there is none)."""
+    first = tag.contents[0] if tag.contents else None
+    if isinstance(first, NavigableString) and not isinstance(first, Comment):
+        return str(first)
+    return ''
+
+
+def bs4_attendance_row(tr_tag):
+    """Parse one attendance table row into a dict."""
+    data = {}
+    try:
+        td_roll_no = tr_tag.find('td', {'class': 'tdRollNo'})
+        data['roll_number'] = td_roll_no.text.strip().replace(' ', '')
+    except AttributeError:
+        data['roll_number'] = "N/A"
+        logging.error("Error: tdRollNo not found.")
+
+    try:
+        td_percent = tr_tag.find('td', {'class': 'tdPercent'})
+        data['attendance_percentage'] = leading_text(td_percent).strip()
+        font_tag = td_percent.find('font')
+        if font_tag:
+            data['total_classes'] = font_tag.text.strip()
+        else:
+            data['total_classes'] = "N/A"
+    except AttributeError:
+        data['attendance_percentage'] = "N/A"
+        data['total_classes'] = "N/A"
+        logging.error("Error: tdPercent not found.")
+
+    subject_data = {td['title']: td.text.strip() for td in tr_tag.find_all('td') if 'title' in td.attrs}
+    data.update(subject_data)
+    return data
+
+
+def bs4_attendance_rows(html_content):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    return collect_attendance_rows(((tr_tag['id'], tr_tag) for tr_tag in soup.find_all('tr', id=True)), bs4_attendance_row)
+
+
+def bs4_mid_marks_rows(html_content):
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    # Get the main marks table (usually the last one)
+    tables = soup.find_all('table')
+    if not tables:
+        logging.error("No tables found in the page")
+        return {}
+
+    return collect_mid_marks_rows(
+        (tr.get('name'), tr.get('id'), [(td.get('name', '').strip(), td.text.strip()) for td in tr.find_all('td')])
+        for tr in tables[-1].find_all('tr')
+    )
+
+
+# --- lxml backend: one C-level parse and compiled XPath lookups ---
+
+if lxml:
+    ROWS_WITH_ID = etree.XPath("//tr[@id]")
+    ALL_TABLES = etree.XPath("//table")
+    ROLL_CELL = etree.XPath(".//td[contains(concat(' ', normalize-space(@class), ' '), ' tdRollNo ')]")
+    PERCENT_CELL = etree.XPath(".//td[contains(concat(' ', normalize-space(@class), ' '), ' tdPercent ')]")
+    TITLED_CELLS = etree.XPath(".//td[@title]")
+
+
+def lxml_attendance_row(tr):
+    """Parse one attendance table row into a dict (same output as bs4_attendance_row)."""
+    data = {}
+    roll_cells = ROLL_CELL(tr)
+    if roll_cells:
+        data['roll_number'] = roll_cells[0].text_content().strip().replace(' ', '')
+    else:
+        data['roll_number'] = "N/A"
+        logging.error("Error: tdRollNo not found.")
+
+    percent_cells = PERCENT_CELL(tr)
+    if percent_cells:
+        td_percent = percent_cells[0]
+        data['attendance_percentage'] = (td_percent.text or '').strip()
+        font_tag = td_percent.find('.//font')
+        data['total_classes'] = font_tag.text_content().strip() if font_tag is not None else "N/A"
+    else:
+        data['attendance_percentage'] = "N/A"
+        data['total_classes'] = "N/A"
+        logging.error("Error: tdPercent not found.")
+
+    for td in TITLED_CELLS(tr):
+        data[td.get('title')] = td.text_content().strip()
+    return data
+
+
+def lxml_attendance_rows(html_content):
+    document = lxml.html.document_fromstring(html_content)
+    return collect_attendance_rows(((tr.get('id'), tr) for tr in ROWS_WITH_ID(document)), lxml_attendance_row)
+
+
+def lxml_mid_marks_rows(html_content):
+    document = lxml.html.document_fromstring(html_content)
+
+    # Get the main marks table (usually the last one)
+    tables = ALL_TABLES(document)
+    if not tables:
+        logging.error("No tables found in the page")
+        return {}
+
+    return collect_mid_marks_rows(
+        (tr.get('name'), tr.get('id'), [((td.get('name') or '').strip(), td.text_content().strip()) for td in tr.iter('td')])
+        for tr in tables[-1].iter('tr')
+    )
+
+
+ATTENDANCE_PARSERS = {"bs4": bs4_attendance_rows}
+MID_MARKS_PARSERS = {"bs4": bs4_mid_marks_rows}
+if lxml:
+    ATTENDANCE_PARSERS["lxml"] = lxml_attendance_rows
+    MID_MARKS_PARSERS["lxml"] = lxml_mid_marks_rows
+
+
+def extract_attendance_rows(html_content, backend=None):
+    """Parse every student row of an attendance section page, keyed by roll number."""
+    try:
+        return ATTENDANCE_PARSERS[backend or BACKEND](html_content)
+    except Exception as e:
+        logging.exception(f"Error extracting attendance rows: {e}")
+        return {}
+
+
+def extract_mid_marks_rows(html_content, backend=None):
+    """Parse every student row of a mid marks section page, keyed by roll number."""
+    try:
+        return MID_MARKS_PARSERS[backend or BACKEND](html_content)
+    except Exception as e:
+        logging.exception(f"Error extracting mid marks rows: {e}")
+        return {}
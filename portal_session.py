@@ -0,0 +1,50 @@
+import logging
+import threading
+
+
+class PortalSession:
+    """Authenticated portal cookies shared by every browser and HTTP fetch.
+
+    ``generation`` increases each time the cookies change. Callers remember
+    the generation they used; when the portal sends them back to the login
+    page they call ``refresh(generation)``. Only the first caller for a stale
+    generation logs in, the others wait and reuse its cookies (single-flight).
+    """
+
+    def __init__(self, login_func):
+        self.login_func = login_func
+        self.generation = 0
+        self._cookies = {}
+        self._lock = threading.Lock()
+        self._login_lock = threading.Lock()
+        self.logins = 0
+
+    def snapshot(self):
+        """Return (generation, cookies) for the current session."""
+        with self._lock:
+            return self.generation, dict(self._cookies)
+
+    def publish(self, cookies):
+        """Replace the shared cookies, e.g. after a login done elsewhere."""
+        with self._lock:
+            self._cookies = dict(cookies)
+            self.generation += 1
+            return self.generation
+
+    def refresh(self, seen_generation, login_func=None):
+        """Log in again unless another caller already did since seen_generation.
+
+        Returns True when fresh cookies are available.
+        """
+        with self._login_lock:
+            with self._lock:
+                if self.generation != seen_generation and self._cookies:
+                    return True
+            cookies = (login_func or self.login_func)()
+            if not cookies:
+                logging.error("Portal login failed; session not refreshed.")
+                return False
+            self.logins += 1
+            generation = self.publish(cookies)
+            logging.info(f"Portal session refreshed (generation {generation}).")
+            return True
@@ -0,0 +1,229 @@
+"""Background pre-warming of popular section pages.
+
+During configured time windows (e.g. the mornings after the attendance
+update, or the week after mid exams) a background thread fetches the
+sections students are most likely to ask for next, so the first student of
+each section gets an answer from the section cache instead of waiting for
+the portal. Sections are ranked by how often they were looked up recently,
+then by how many stored users belong to the class (their marks_* fields).
+
+Pre-warming is deliberately gentle: at most ``concurrency`` fetches run at
+once, fetches start at most once every ``pace`` seconds, and a round stops
+as soon as students' own lookups are waiting in the job queue.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from broadcast_engine import TokenBucket
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+class SectionDemand:
+    """Recent lookups per section key, kept for `window` seconds."""
+
+    def __init__(self, window=24 * 3600, max_keys=5000):
+        self.window = window
+        self.max_keys = max_keys
+        self._times = {}  # key -> deque of lookup timestamps
+        self._lock = threading.Lock()
+
+    def record(self, key):
+        now = time.time()
+        with self._lock:
+            times = self._times.get(key)
+            if times is None:
+                if len(self._times) >= self.max_keys:
+                    self._prune(now)
+                times = self._times[key] = deque()
+            times.append(now)
+
+    def _prune(self, now):
+        for key in list(self._times):
+            times = self._times[key]
+            while times and now - times[0] > self.window:
+                times.popleft()
+            if not times:
+                del self._times[key]
+
+    def counts(self):
+        """{key: lookups within the window}."""
+        with self._lock:
+            self._prune(time.time())
+            return {key: len(times) for key, times in self._times.items()}
+
+
+class Window:
+    """A daily time window such as {"days": ["mon", "tue"], "start": "08:00", "end": "11:30"}.
+
+    `days` is optional (every day when missing). A window whose end is before
+    its start runs past midnight; `days` then refers to the day it starts.
+    """
+
+    def __init__(self, start, end, days=None):
+        self.start = self._minutes(start)
+        self.end = self._minutes(end)
+        self.days = {DAYS.index(day.lower()[:3]) for day in days} if days else set(range(7))
+
+    @staticmethod
+    def _minutes(text):
+        hours, minutes = text.split(":")
+        return int(hours) * 60 + int(minutes)
+
+    def contains(self, now):
+        minute = now.hour * 60 + now.minute
+        if self.start <= self.end:
+            return now.weekday() in self.days and self.start <= minute < self.end
+        if minute >= self.start:
+            return now.weekday() in self.days
+        return (now.weekday() - 1) % 7 in self.days and minute < self.end
+
+
+def popular_sections(demand, class_counts, academic_year, page_kinds, limit):
+    """Section keys to pre-warm, most wanted first.
+
+    demand: {(academic year, year of study, branch code, section, page kind): recent lookups}
+    class_counts: {(academic year, year of study, branch code, section): stored users}
+    Only sections of `academic_year` are returned.
+    """
+    scores = {}
+    for key, lookups in demand.items():
+        if key[0] == academic_year and key[4] in page_kinds:
+            scores[key] = [lookups, 0]
+    for selection, users in class_counts.items():
+        if selection[0] != academic_year:
+            continue
+        for page_kind in page_kinds:
+            scores.setdefault((*selection, page_kind), [0, 0])[1] = users
+    ranked = sorted(scores, key=lambda key: scores[key], reverse=True)
+    return ranked[:limit]
+
+
+class Prewarmer:
+    """Background thread that keeps popular sections in the section cache during the windows.
+
+    fetch(key) fetches and caches one section and returns its rows (a fetch
+    that comes back empty, e.g. when the page timed out, is not cached and
+    counts as failed), age(key) returns how old its cached copy is (None when
+    not cached), candidates() returns the keys in priority order and busy()
+    tells whether students' lookups are waiting.
+    """
+
+    def __init__(self, fetch, age, candidates, windows, busy=None, interval=300, concurrency=1,
+                 pace=5.0, refresh_after=450):
+        self.fetch = fetch
+        self.age = age
+        self.candidates = candidates
+        self.windows = [window if isinstance(window, Window) else Window(**window) for window in windows]
+        self.busy = busy or (lambda: False)
+        self.interval = interval
+        self.concurrency = max(1, int(concurrency))
+        self.refresh_after = refresh_after
+        self.bucket = TokenBucket(1.0 / max(pace, 0.001), capacity=1)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._forced = False
+        self._lock = threading.Lock()
+        self._thread = None
+        self._failed_at = {}  # key -> time of its last failed fetch
+        self.rounds = 0
+        self.fetched = 0
+        self.failed = 0
+        self.last_round = None
+
+    def active(self, now=None):
+        now = now or datetime.now()
+        return any(window.contains(now) for window in self.windows)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="Prewarmer", daemon=True)
+        self._thread.start()
+        logging.info(f"Pre-warmer started: {len(self.windows)} windows, every {self.interval}s, "
+                     f"{self.concurrency} at a time.")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def trigger(self):
+        """Run a round now, even outside the windows (e.g. right after the portal was updated)."""
+        with self._lock:
+            self._forced = True
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                forced, self._forced = self._forced, False
+            if forced or self.active():
+                try:
+                    self.run_round()
+                except Exception as e:
+                    logging.exception(f"Pre-warm round failed: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _due(self, key, now):
+        failed_at = self._failed_at.get(key)
+        if failed_at is not None and now - failed_at < self.interval * 3:
+            return False  # Failed recently (e.g. the portal has no such section); retried after a few rounds
+        age = self.age(key)
+        return age is None or age >= self.refresh_after
+
+    def _fetch(self, key):
+        if self._stop.is_set() or self.busy():
+            return None
+        try:
+            rows = self.fetch(key)
+        except Exception as e:
+            logging.warning(f"Pre-warming {key} failed: {e}")
+            rows = None
+        else:
+            if not rows:
+                logging.warning(f"Pre-warming {key} found no rows; nothing was cached.")
+        with self._lock:
+            if rows:
+                self._failed_at.pop(key, None)
+            else:
+                self._failed_at[key] = time.time()
+        return bool(rows)
+
+    def run_round(self):
+        """Fetch every candidate that is missing or about to expire. Returns (fetched, failed)."""
+        started = time.monotonic()
+        now = time.time()
+        with self._lock:
+            due = [key for key in self.candidates() if self._due(key, now)]
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="Prewarm") as pool:
+            for key in due:
+                if self._stop.is_set() or self.busy():
+                    logging.info("Pre-warm round stopped early: students' lookups are waiting.")
+                    break
+                self.bucket.acquire()
+                futures.append(pool.submit(self._fetch, key))
+        results = [future.result() for future in futures]
+        fetched, failed = results.count(True), results.count(False)
+        with self._lock:
+            self.rounds += 1
+            self.fetched += fetched
+            self.failed += failed
+            self.last_round = time.time()
+        logging.info(f"Pre-warm round: {fetched} sections fetched, {failed} failed, "
+                     f"{len(due) - fetched - failed} skipped, in {time.monotonic() - started:.1f}s.")
+        return fetched, failed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active": self.active(),
+                "rounds": self.rounds,
+                "fetched": self.fetched,
+                "failed": self.failed,
+                "last_round_ago": round(time.time() - self.last_round) if self.last_round else None,
+            }
@@ -0,0 +1,165 @@
+"""Event-driven readiness checks for the scraping browser.
+
+Every wait is named (e.g. "section_rows") and gets its own adaptive timeout:
+a multiple of the recent 95th percentile wait for that step, clamped between
+a floor and the old fixed ceiling. Conditions are polled every 50 ms instead
+of WebDriverWait's default 500 ms, so a wait ends almost as soon as the page
+is ready. A wait that outlives its learned timeout keeps going up to the
+ceiling once, so one slow page does not fail a lookup (and every lookup
+sharing it); only while that kind of wait keeps timing out does it give up
+at the learned timeout, so a portal that stopped answering is noticed in
+seconds rather than after 30.
+"""
+import threading
+import time
+from collections import deque
+
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+POLL_INTERVAL = 0.05  # Seconds between condition checks
+TIMEOUT_MARGIN = 3.0  # Timeout = p95 of recent waits x this margin
+MIN_SAMPLES = 5  # Waits observed before the timeout adapts; until then the ceiling applies
+
+
+def _is_rollno(attribute):
+    """XPath test: the attribute looks like a roll number (10 characters starting with the 2-digit batch year)."""
+    return f"string-length({attribute}) = 10 and translate(substring({attribute}, 1, 2), '0123456789', '') = ''"
+
+
+# Student rows of the portal's result tables, told apart by their roll number
+# ids. Layout rows (headers, menus, the class selection form) never match, so
+# a wait ends only once the results are in.
+ATTENDANCE_ROW = (By.XPATH, f"//tr[{_is_rollno('@id')}]")
+MID_MARKS_ROW = (By.XPATH, f"//tr[{_is_rollno('@name')} or {_is_rollno('@id')}][td]")
+
+
+class AdaptiveTimeout:
+    """Timeout for one kind of wait, learned from its recent durations."""
+
+    def __init__(self, floor, ceiling, window=50):
+        self.floor = floor
+        self.ceiling = ceiling
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.timeouts = 0
+        self.extended = 0  # Waits that outlived the learned timeout and were given up to the ceiling
+        self.last_timed_out = False
+
+    def _percentile(self, samples, fraction):
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+    @property
+    def value(self):
+        with self._lock:
+            if len(self._samples) < MIN_SAMPLES:
+                return self.ceiling
+            p95 = self._percentile(sorted(self._samples), 0.95)
+        return min(self.ceiling, max(self.floor, p95 * TIMEOUT_MARGIN))
+
+    def record(self, seconds, timed_out=False):
+        with self._lock:
+            self._samples.append(seconds)
+            self.last_timed_out = timed_out
+            if timed_out:
+                self.timeouts += 1
+
+    def stats(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            timeouts = self.timeouts
+            extended = self.extended
+        return {
+            "timeout": round(self.value, 2),
+            "p50": round(self._percentile(samples, 0.5), 3) if samples else None,
+            "samples": len(samples),
+            "timeouts": timeouts,
+            "extended": extended,
+        }
+
+
+_timeouts = {}
+_timeouts_lock = threading.Lock()
+
+
+def timeout_for(name, floor=2, ceiling=30):
+    with _timeouts_lock:
+        if name not in _timeouts:
+            _timeouts[name] = AdaptiveTimeout(floor, ceiling)
+        return _timeouts[name]
+
+
+def _until(browser, seconds, condition):
+    return WebDriverWait(browser, seconds, poll_frequency=POLL_INTERVAL,
+                         ignored_exceptions=(NoSuchElementException, StaleElementReferenceException)).until(condition)
+
+
+def wait_for(browser, name, condition, floor=2, ceiling=30):
+    """Wait until condition(browser) returns something truthy and return it.
+
+    Raises TimeoutException after the adaptive timeout for `name`, or after
+    the ceiling when the previous wait of that kind did not time out. A
+    timeout is recorded as a long sample, so the next wait of that kind gets
+    longer.
+    """
+    timeout = timeout_for(name, floor, ceiling)
+    limit = timeout.value
+    give_up_early = timeout.last_timed_out
+    started = time.monotonic()
+    try:
+        result = _until(browser, limit, condition)
+    except TimeoutException:
+        if give_up_early or limit >= timeout.ceiling:
+            timeout.record(time.monotonic() - started, timed_out=True)
+            raise
+        with timeout._lock:
+            timeout.extended += 1
+        try:
+            result = _until(browser, max(0.0, timeout.ceiling - (time.monotonic() - started)), condition)
+        except TimeoutException:
+            timeout.record(time.monotonic() - started, timed_out=True)
+            raise
+    timeout.record(time.monotonic() - started)
+    return result
+
+
+def first_present(*locators):
+    """Condition: the first element found by any of the locators, or False."""
+    def condition(browser):
+        for by, value in locators:
+            elements = browser.find_elements(by, value)
+            if elements:
+                return elements[0]
+        return False
+    return condition
+
+
+def all_present(*locators):
+    """Condition: one element per locator once every one of them is present, or False."""
+    def condition(browser):
+        found = []
+        for by, value in locators:
+            elements = browser.find_elements(by, value)
+            if not elements:
+                return False
+            found.append(elements[0])
+        return found
+    return condition
+
+
+def clickable(by, value):
+    """Condition: the element if it is displayed and enabled, or False."""
+    def condition(browser):
+        for element in browser.find_elements(by, value):
+            if element.is_displayed() and element.is_enabled():
+                return element
+        return False
+    return condition
+
+
+def stats():
+    """{wait name: timeout, p50, samples, timeouts} for every wait seen so far."""
+    with _timeouts_lock:
+        items = list(_timeouts.items())
+    return {name: timeout.stats() for name, timeout in items}
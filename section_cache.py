@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SectionCache:
+    """Thread-safe TTL + LRU cache of parsed section pages.
+
+    Keys are ``(academic_year, year_of_study, branch_code, section, page_kind)``
+    and values are the parsed rows of the whole section, keyed by roll number.
+    """
+
+    def __init__(self, ttl=600, max_entries=64):
+        self.ttl = ttl
+        self.max_entries = max(1, int(max_entries))
+        self._entries = OrderedDict()  # key -> (stored_at, rows)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached rows for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, rows = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rows
+
+    def peek(self, key):
+        """Like get(), but not counted as a hit or miss and without refreshing the LRU order."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                return None
+            return entry[1]
+
+    def put(self, key, rows):
+        """Store the rows for key, evicting the least recently used entries."""
+        with self._lock:
+            self._entries[key] = (time.time(), rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def age(self, key):
+        """Seconds since key was stored, or None if it is missing or expired. Not counted as a hit or miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            age = time.time() - entry[0]
+            return age if age <= self.ttl else None
+
+    def invalidate(self, key=None):
+        """Drop one key, or the whole cache when key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -1,16 +1,31 @@
-import json
-from telebot import TeleBot
-import time
+from telebot import TeleBot, apihelper, asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
 import os  # Import os for file path validation
 import re  # For improved URL validation
 import logging
+import json
+import hashlib
+import time
+import argparse
+import asyncio
+from user_data_manager import load_user_data, delete_user, find_users, flush
+from broadcast_engine import BroadcastEngine, TokenBucket
+from broadcast_jobs import BroadcastJob
+from async_runtime import AsyncBroadcastEngine
+from fake_telegram_api import FakeTelegramAPI
 
 # Replace 'YOUR_API_KEY' with your bot's API key
 API_KEY = '7874697193:AAHkMBjc-tdNx5KBhtMnJ-ZheI5EzIdp2a8'
 bot = TeleBot(API_KEY)
 
-# Define the JSON file name
-DATA_FILE = "nbkrist_attendance_user_data.json"
+# Content hash -> Telegram file_id of images already uploaded
+FILE_ID_CACHE_FILE = "broadcast_file_ids.json"
+
+# Sends concurrently, capped at Telegram's global and per-chat rate limits
+engine = BroadcastEngine(rate=25, concurrency=8)
+
+# Recipients dispatched between two checkpoints of a broadcast job's cursor
+CHECKPOINT_EVERY = 100
 
 # Set up logging to log to a file
 logging.basicConfig(filename='send_message.log', level=logging.INFO, format='%(asctime)s - %(message)s')
@@ -19,75 +34,291 @@ def log_message(message):
     """Log the message to the log file."""
     logging.info(message)
 
-def load_user_data():
-    """Load user data from the JSON file."""
+def report_delivery(users, report, what):
+    """Log the per-user delivery report and print a summary."""
+    counts = {}
+    for user_id, entry in report.items():
+        username = users.get(user_id, {}).get('username', 'Unknown')
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        if entry["status"] == "sent":
+            log_message(f"{what} sent to user {user_id} ({username}).")
+        else:
+            log_message(f"Failed to send {what.lower()} to user {user_id} ({username}) after {entry['attempts']} attempts: {entry['status']} - {entry['error']}")
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    log_message(f"{what} broadcast finished: {summary}")
+    print(f"{what} broadcast finished: {summary}")
+
+def load_file_id_cache():
+    """Load the content hash -> Telegram file_id cache."""
     try:
-        with open(DATA_FILE, "r") as file:
+        with open(FILE_ID_CACHE_FILE, "r") as file:
             return json.load(file)
-    except FileNotFoundError:
-        print("User data file not found.")
-        return {}
-    except json.JSONDecodeError:
-        print("Error decoding JSON file.")
+    except (FileNotFoundError, json.JSONDecodeError):
         return {}
 
-def send_text_to_all_users(message, retries=3):
-    """Send a text message to all users listed in the JSON file, with retries."""
-    users = load_user_data()
-    if not users:
-        print("No users found in the data file.")
-        return
+def save_file_id_cache(cache):
+    """Save the file_id cache atomically (temp file + rename)."""
+    tmp_path = FILE_ID_CACHE_FILE + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(cache, file, indent=4)
+    os.replace(tmp_path, FILE_ID_CACHE_FILE)
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def is_file_id_rejected(error):
+    """True when Telegram refused the file_id itself (400 "wrong file identifier"), not a transient failure."""
+    return (isinstance(error, apihelper.ApiTelegramException) and error.error_code == 400
+            and "file identifier" in (error.description or "").lower())
+
+def upload_image_once(job, user_ids):
+    """Make sure Telegram has the job's image and its file_id is in the payload.
+
+    A known file_id (from the job or the content hash cache) is checked on the
+    first user and only replaced if Telegram rejects it as unknown; other
+    failures (timeouts, 5xx, 429) go through the engine's retries like any
+    send. Without a file_id the image is sent to users one by one until a send
+    succeeds. Returns the users that still need the image.
+    """
+    payload = job.payload
+    is_url = payload["is_url"]
+    cache = {} if is_url else load_file_id_cache()
+    content_hash = payload.get("sha256")
+    file_id = payload.get("file_id") or cache.get(content_hash)
+    user_ids = list(user_ids)
+
+    def send_source(user_id):
+        if is_url:
+            return bot.send_photo(user_id, payload["image_source"], caption=payload["caption"])
+        with open(payload["image_source"], "rb") as photo:
+            return bot.send_photo(user_id, photo, caption=payload["caption"])
 
-    for user_id, user_info in users.items():
-        attempt = 0
-        while attempt < retries:
+    if file_id and user_ids:
+        # Telegram rejects file_ids it no longer knows
+        rejected = []
+
+        def send_cached(chat_id):
             try:
-                bot.send_message(user_id, message)
-                log_message(f"Message sent to user {user_id} ({user_info.get('username', 'Unknown')}): {message}")
-                print(f"Message sent to user {user_id} ({user_info.get('username', 'Unknown')}): {message}")
-                break
+                return bot.send_photo(chat_id, file_id, caption=payload["caption"])
             except Exception as e:
-                attempt += 1
-                if attempt >= retries:
-                    log_message(f"Failed to send message to user {user_id}: {e}")
-                    print(f"Failed to send message to user {user_id}: {e}")
-                time.sleep(1)  # Wait before retrying
+                if is_file_id_rejected(e):
+                    rejected.append(e)
+                raise
 
-def send_image_to_all_users(image_source, caption, is_url=False, retries=3):
-    """Send an image (local or URL) to all users listed in the JSON file, with retries."""
+        user_id = user_ids.pop(0)
+        entry = engine.deliver(user_id, send_cached)
+        job.record(user_id, entry)
+        if entry["status"] == "failed" and rejected:
+            log_message(f"Cached file_id rejected ({entry['error']}), uploading the image again.")
+            cache.pop(content_hash, None)
+            file_id = None
+            user_ids.insert(0, user_id)
+
+    # Send to users one by one until Telegram has the photo and gave us its file_id
+    while user_ids and not file_id:
+        user_id = user_ids.pop(0)
+        entry = engine.deliver(user_id, send_source)
+        job.record(user_id, entry)
+        if entry["status"] == "sent":
+            file_id = entry["result"].photo[-1].file_id
+            log_message(f"Image uploaded once, reusing file_id {file_id}")
+            if content_hash:
+                cache[content_hash] = file_id
+                save_file_id_cache(cache)
+
+    payload["file_id"] = file_id
+    job.save()
+    return user_ids
+
+async def send_chunks_async(job, chunks, positions):
+    """Send the job's chunks as coroutines (AsyncTeleBot), checkpointing after each."""
+    client = AsyncTeleBot(bot.token)
+    async_engine = AsyncBroadcastEngine(rate=engine.bucket.rate, concurrency=engine.concurrency, retries=engine.retries)
+    payload = job.payload
+    if job.kind == "text":
+        send = lambda user_id: client.send_message(user_id, payload["text"])
+    else:
+        send = lambda user_id: client.send_photo(user_id, payload["file_id"], caption=payload["caption"])
+    try:
+        for chunk in chunks:
+            await async_engine.run(chunk, send, on_result=job.record)
+            job.cursor = positions[chunk[-1]] + 1
+            job.save()
+    finally:
+        await client.close_session()
+
+def run_job(job, retries=3, use_async=False):
+    """Send a broadcast job to every recipient it has not reached yet.
+
+    Results are appended to the job log as they arrive and the cursor is
+    checkpointed every CHECKPOINT_EVERY recipients, so an interrupted job can
+    be resumed with --resume without messaging anyone twice. With use_async
+    the sends run as coroutines on one thread instead of a thread pool.
+    """
     users = load_user_data()
-    if not users:
-        print("No users found in the data file.")
-        return
+    engine.retries = retries
+    payload = job.payload
+    pending = job.pending()
+    log_message(f"Broadcast job {job.id}: {len(pending)} of {len(job.recipients)} recipients pending.")
+    print(f"Broadcast job {job.id}: {len(pending)} of {len(job.recipients)} recipients pending.")
 
-    for user_id, user_info in users.items():
-        attempt = 0
-        while attempt < retries:
-            try:
-                if is_url:
-                    bot.send_photo(user_id, image_source, caption=caption)
-                else:
-                    with open(image_source, "rb") as photo:
-                        bot.send_photo(user_id, photo, caption=caption)
-                log_message(f"Image sent to user {user_id} ({user_info.get('username', 'Unknown')}).")
-                print(f"Image sent to user {user_id} ({user_info.get('username', 'Unknown')}).")
-                break
-            except Exception as e:
-                attempt += 1
-                if attempt >= retries:
-                    log_message(f"Failed to send image to user {user_id}: {e}")
-                    print(f"Failed to send image to user {user_id}: {e}")
-                time.sleep(1)  # Wait before retrying
+    try:
+        if job.kind == "text":
+            what = "Message"
+            send = lambda user_id: bot.send_message(user_id, payload["text"])
+        else:
+            what = "Image"
+            pending = upload_image_once(job, pending)
+            send = lambda user_id: bot.send_photo(user_id, payload["file_id"], caption=payload["caption"])
+
+        positions = {user_id: index for index, user_id in enumerate(job.recipients)}
+        chunks = [pending[start:start + CHECKPOINT_EVERY] for start in range(0, len(pending), CHECKPOINT_EVERY)]
+        if use_async:
+            asyncio.run(send_chunks_async(job, chunks, positions))
+        else:
+            for chunk in chunks:
+                engine.run(chunk, send, on_result=job.record)
+                job.cursor = positions[chunk[-1]] + 1
+                job.save()
+    except BaseException:
+        job.state = "interrupted"
+        job.save()
+        log_message(f"Broadcast job {job.id} interrupted at recipient {job.cursor}.")
+        print(f"\nBroadcast interrupted. Resume it with: --resume {job.id}")
+        raise
+
+    job.finish()
+    report = {user_id: job.results[user_id] for user_id in job.recipients if user_id in job.results}
+    report_delivery(users, report, what)
+    return report
+
+def prune_blocked_users(job):
+    """Remove users who blocked the bot (403) during a job from the user store."""
+    pruned = [user_id for user_id in job.blocked() if delete_user(user_id)]
+    flush()
+    log_message(f"Pruned {len(pruned)} users who blocked the bot: {pruned}")
+    print(f"Removed {len(pruned)} users who blocked the bot from the user store.")
+    return pruned
+
+class BroadcastStats:
+    """Outcome of one broadcast run."""
+
+    def __init__(self, job_id, report, elapsed):
+        self.job_id = job_id
+        self.recipients = len(report)
+        self.sent = sum(1 for entry in report.values() if entry["status"] == "sent")
+        self.blocked = sum(1 for entry in report.values() if entry["status"] == "blocked")
+        self.failed = self.recipients - self.sent - self.blocked
+        self.elapsed = elapsed
+
+    @property
+    def throughput(self):
+        """Messages delivered per second."""
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {"job_id": self.job_id, "recipients": self.recipients, "sent": self.sent, "failed": self.failed,
+                "blocked": self.blocked, "elapsed": round(self.elapsed, 3), "throughput": round(self.throughput, 2)}
+
+    def __str__(self):
+        return (f"job {self.job_id}: {self.sent} sent, {self.failed} failed, {self.blocked} blocked "
+                f"in {self.elapsed:.1f}s ({self.throughput:.1f} msg/s)")
+
+def select_audience(audience=None):
+    """Return the ids of users whose stored fields match every {field: value} in audience.
+
+    Values are compared case-insensitively, so {"marks_section": "C"} also
+    matches users stored with section "c".
+    """
+    if not audience:
+        return list(load_user_data())
+    return sorted(find_users(audience))
+
+def configure_engine(concurrency=None, rate=None):
+    """Change the broadcast concurrency and/or global send rate (messages per second)."""
+    if concurrency:
+        engine.concurrency = max(1, int(concurrency))
+    if rate:
+        engine.bucket = TokenBucket(rate)
+
+def _finish_run(job, report, started, prune_blocked):
+    stats = BroadcastStats(job.id, report, time.monotonic() - started)
+    log_message(f"Broadcast stats: {stats.as_dict()}")
+    if prune_blocked:
+        prune_blocked_users(job)
+    return stats
+
+def broadcast(text=None, image=None, caption="", is_url=False, audience=None,
+              concurrency=None, rate=None, retries=3, prune_blocked=False, use_async=False):
+    """Send a text message or an image to the matching users as a resumable job.
+
+    Exactly one of text and image (a local path, or a URL with is_url=True)
+    must be given. audience filters users on their stored fields, e.g.
+    {"marks_branch": "CSE", "marks_section": "A"}. Returns BroadcastStats.
+    """
+    if (text is None) == (image is None):
+        raise ValueError("broadcast() needs exactly one of text or image")
+    configure_engine(concurrency, rate)
+    recipients = select_audience(audience)
+    if not recipients:
+        print("No users match the selected audience.")
+        return BroadcastStats(None, {}, 0.0)
+
+    if text is not None:
+        job = BroadcastJob.create("text", {"text": text}, recipients)
+    else:
+        # The image is uploaded (or fetched by Telegram) once; every other user gets the returned file_id
+        payload = {"image_source": image, "caption": caption, "is_url": is_url, "file_id": None,
+                   "sha256": None if is_url else file_sha256(image)}
+        job = BroadcastJob.create("image", payload, recipients)
+
+    started = time.monotonic()
+    report = run_job(job, retries, use_async)
+    return _finish_run(job, report, started, prune_blocked)
+
+def resume_broadcast(job_id, concurrency=None, rate=None, retries=3, prune_blocked=False, use_async=False):
+    """Finish an interrupted broadcast job. Returns BroadcastStats for the whole job."""
+    configure_engine(concurrency, rate)
+    job = BroadcastJob.load(job_id)
+    started = time.monotonic()
+    if job.state == "done":
+        print(f"Broadcast job {job.id} already finished.")
+        report = dict(job.results)
+    else:
+        report = run_job(job, retries, use_async)
+    return _finish_run(job, report, started, prune_blocked)
+
+def send_text_to_all_users(message, retries=3):
+    """Send a text message to all users in the user store."""
+    return broadcast(text=message, retries=retries)
+
+def send_image_to_all_users(image_source, caption, is_url=False, retries=3):
+    """Send an image (local or URL) to all users in the user store."""
+    return broadcast(image=image_source, caption=caption, is_url=is_url, retries=retries)
+
+def start_dry_run():
+    """Send everything to a local fake Telegram API instead of the real one."""
+    fake_api = FakeTelegramAPI(latency=0.05).start()
+    apihelper.API_URL = fake_api.api_url
+    asyncio_helper.API_URL = fake_api.api_url
+    log_message(f"Dry run: using fake Telegram API at {fake_api.api_url}")
+    print("Dry run: messages go to a local fake Telegram API, nobody will receive them.")
+    return fake_api
 
 def is_valid_url(url):
     """Validate the URL format using a regex pattern."""
     url_pattern = re.compile(r"^(http|https)://[^\s/$.?#].[^\s]*$")
     return url_pattern.match(url)
 
-def main():
-    """Main function to execute the sending of messages."""
-    log_message("Message sending process started.")
-    
+def interactive_main(prune_blocked=False):
+    """Ask what to send with input() prompts."""
+    if input("Do a dry run against a local fake Telegram API? (yes/no): ").strip().lower() == "yes":
+        start_dry_run()
+
     # Ask user for each option
     send_text = input("Do you want to send a text message? (yes/no): ").strip().lower() == "yes"
     send_local_image = input("Do you want to send a local image? (yes/no): ").strip().lower() == "yes"
@@ -112,7 +343,7 @@ def main():
     if send_text:
         message = input("Enter the text message to send to all users: ").strip()
         if message:
-            send_text_to_all_users(message)
+            print(broadcast(text=message, prune_blocked=prune_blocked))
         else:
             print("No message entered. Skipping text message.")
 
@@ -123,7 +354,7 @@ def main():
             print("Invalid image path. Skipping local image.")
         else:
             caption = input("Enter a caption for the local image (optional): ").strip()
-            send_image_to_all_users(image_path, caption, is_url=False)
+            print(broadcast(image=image_path, caption=caption, prune_blocked=prune_blocked))
 
     # Send Image from URL
     if send_url_image:
@@ -132,9 +363,81 @@ def main():
             print("Invalid URL format. Skipping image from URL.")
         else:
             caption = input("Enter a caption for the URL image (optional): ").strip()
-            send_image_to_all_users(image_url, caption, is_url=True)
+            print(broadcast(image=image_url, caption=caption, is_url=True, prune_blocked=prune_blocked))
 
     print("\nMessages have been sent.")
+
+def parse_audience(args):
+    """Build the {field: value} audience filter from the command line options."""
+    audience = {}
+    for condition in args.where:
+        field, separator, value = condition.partition("=")
+        if not separator or not field.strip():
+            raise SystemExit(f"Invalid --where condition {condition!r}, expected FIELD=VALUE")
+        audience[field.strip()] = value.strip()
+    shortcuts = {"marks_academic_year": args.academic_year, "marks_year_of_study": args.year_of_study,
+                 "marks_branch": args.branch, "marks_section": args.section}
+    audience.update({field: value for field, value in shortcuts.items() if value})
+    return audience
+
+def main():
+    """Main function to execute the sending of messages.
+
+    Without a message, image or --resume option the script asks interactively.
+    """
+    parser = argparse.ArgumentParser(description="Broadcast a message or image to bot users.")
+    parser.add_argument("--text", help="Text message to send")
+    parser.add_argument("--image", metavar="PATH", help="Local image to send")
+    parser.add_argument("--image-url", metavar="URL", help="Image URL to send")
+    parser.add_argument("--caption", default="", help="Caption for the image")
+    parser.add_argument("--where", action="append", default=[], metavar="FIELD=VALUE",
+                        help="Only send to users whose stored FIELD equals VALUE (repeatable)")
+    parser.add_argument("--academic-year", help="Shortcut for --where marks_academic_year=YEAR (e.g. 2024-25)")
+    parser.add_argument("--year-of-study", help="Shortcut for --where marks_year_of_study=YEAR (e.g. 31 for 3-1)")
+    parser.add_argument("--branch", help="Shortcut for --where marks_branch=CODE (portal branch code, e.g. 5 for CSE)")
+    parser.add_argument("--section", help="Shortcut for --where marks_section=SECTION")
+    parser.add_argument("--concurrency", type=int, default=engine.concurrency, help="Parallel senders")
+    parser.add_argument("--rate", type=float, default=engine.bucket.rate, help="Messages per second overall")
+    parser.add_argument("--retries", type=int, default=3, help="Attempts per user")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Send with asyncio coroutines instead of a thread pool")
+    parser.add_argument("--dry-run", action="store_true", help="Send to a local fake Telegram API")
+    parser.add_argument("--resume", metavar="JOB_ID", help="Resume an interrupted broadcast job")
+    parser.add_argument("--prune-blocked", action="store_true",
+                        help="Remove users who blocked the bot from the user store after sending")
+    args = parser.parse_args()
+
+    log_message("Message sending process started.")
+
+    if not (args.text or args.image or args.image_url or args.resume):
+        configure_engine(args.concurrency, args.rate)
+        interactive_main(args.prune_blocked)
+        log_message("Message sending process completed.")
+        return
+
+    if args.image and not os.path.isfile(args.image):
+        parser.error(f"Image not found: {args.image}")
+    if args.image_url and not is_valid_url(args.image_url):
+        parser.error(f"Invalid image URL: {args.image_url}")
+    audience = parse_audience(args)
+    if args.dry_run:
+        start_dry_run()
+
+    options = {"concurrency": args.concurrency, "rate": args.rate, "retries": args.retries,
+               "prune_blocked": args.prune_blocked, "use_async": args.use_async}
+    if args.resume:
+        try:
+            print(resume_broadcast(args.resume, **options))
+        except FileNotFoundError:
+            print(f"No broadcast job {args.resume} found.")
+        return
+
+    if args.text:
+        print(broadcast(text=args.text, audience=audience, **options))
+    if args.image:
+        print(broadcast(image=args.image, caption=args.caption, audience=audience, **options))
+    if args.image_url:
+        print(broadcast(image=args.image_url, caption=args.caption, is_url=True, audience=audience, **options))
     log_message("Message sending process completed.")
 
 if __name__ == "__main__":
@@ -0,0 +1,90 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+
+from broadcast_engine import TELEGRAM_GLOBAL_RATE, TokenBucket
+
+
+def use_pooled_session(pool_size=32):
+    """Make telebot share one keep-alive connection pool across all threads.
+
+    By default every thread opens its own session (and TLS connection) to the
+    Bot API; with a shared pool, threads reuse warm connections.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    apihelper.session = session
+    return session
+
+
+class _ChatTurns:
+    """FIFO ticket lock of one chat: threads take a ticket and go in ticket order."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.next_ticket = 0
+        self.serving = 0
+        self.users = 0  # Threads holding a ticket
+
+
+class TelegramSender:
+    """Thread-safe gateway for outgoing bot API calls.
+
+    Calls to different chats run in parallel; calls to the same chat run one
+    at a time in the order they arrive, so a user's messages never overtake
+    each other. All calls share a global rate limit.
+    """
+
+    def __init__(self, rate=TELEGRAM_GLOBAL_RATE):
+        self.bucket = TokenBucket(rate)
+        self._chats = {}  # chat_id -> _ChatTurns
+        self._lock = threading.Lock()
+        self.sent = 0
+
+    def _checkout(self, chat_id):
+        """Take the chat's next ticket. Returns (turns, ticket)."""
+        with self._lock:
+            turns = self._chats.get(chat_id)
+            if turns is None:
+                turns = self._chats[chat_id] = _ChatTurns()
+            ticket = turns.next_ticket
+            turns.next_ticket += 1
+            turns.users += 1
+            return turns, ticket
+
+    def _checkin(self, chat_id, turns):
+        with self._lock:
+            turns.users -= 1
+            if turns.users == 0:
+                del self._chats[chat_id]  # Idle chats keep no state around
+
+    def call(self, chat_id, func, /, *args, **kwargs):
+        """Run func(*args, **kwargs) in chat_id's order and within the rate limit.
+
+        chat_id and func are positional-only, so kwargs may carry the API's own chat_id.
+        """
+        turns, ticket = self._checkout(chat_id)
+        try:
+            with turns.condition:
+                while turns.serving != ticket:
+                    turns.condition.wait()
+            try:
+                self.bucket.acquire()
+                result = func(*args, **kwargs)
+            finally:
+                with turns.condition:
+                    turns.serving += 1
+                    turns.condition.notify_all()
+            with self._lock:
+                self.sent += 1
+            return result
+        finally:
+            self._checkin(chat_id, turns)
+
+    def stats(self):
+        with self._lock:
+            return {"sent": self.sent, "active_chats": len(self._chats)}
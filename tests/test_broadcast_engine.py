@@ -0,0 +1,20 @@
+from telebot.apihelper import ApiTelegramException
+
+from broadcast_engine import FINAL, MAX_FLOOD_WAITS, RETRY, Delivery, TokenBucket
+
+
+def flood_error(retry_after):
+    return ApiTelegramException("sendMessage", None, {
+        "error_code": 429, "description": "Too Many Requests", "parameters": {"retry_after": retry_after}})
+
+
+def test_last_flood_error_pauses_senders_without_waiting_for_nothing():
+    delivery = Delivery(42, retries=1)
+    bucket = TokenBucket(25)
+    actions = []
+    while delivery.next_attempt():
+        actions.append(delivery.failed(flood_error(7), bucket))
+
+    assert actions == [(RETRY, 7)] * MAX_FLOOD_WAITS + [(FINAL, 0)]
+    assert delivery.entry["status"] == "failed"
+    assert bucket._take() > 6  # Other senders still wait out the flood limit
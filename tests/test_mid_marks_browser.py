@@ -0,0 +1,148 @@
+"""A mid marks lookup must use exactly one browser (one launch, one pool checkout).
+
+demo1_bot reads config.json from the working directory when imported, so the
+module is imported from a temporary directory with a test config. The
+browser is a fake webdriver serving a mid marks page; the form steps that
+need real Selenium elements (select_form_details, click_show_button) are
+replaced, everything else runs unchanged.
+"""
+import importlib
+import json
+import os
+
+import lxml.html
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+from telebot import types
+
+from browser_pool import BrowserPool
+
+MID_MARKS_PAGE = ("<html><body><table><tr><td>Mid marks</td></tr></table><table>"
+                  "<tr name='22KB1A0501'><td name='DBMS'>14/12(13)</td><td name='AI LAB'>20</td></tr>"
+                  "<tr name='22KB1A0502'><td name='DBMS'>10/11(11)</td></tr>"
+                  "</table></body></html>")
+
+
+class FakeDriver:
+    """Just enough of a webdriver for the mid marks flow."""
+
+    def __init__(self, page_source):
+        self.page_source = page_source
+        self.current_url = "about:blank"
+        self.visited = []
+
+    def get(self, url):
+        self.current_url = url
+        self.visited.append(url)
+
+    def find_elements(self, by, value):
+        if by == By.XPATH:
+            return [dict(element.attrib) for element in lxml.html.document_fromstring(self.page_source).xpath(value)]
+        if by == By.TAG_NAME:
+            return [value] if f"<{value}" in self.page_source else []
+        return [value] if value in self.page_source else []
+
+    def find_element(self, by, value):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(value)
+        return elements[0]
+
+    def get_cookies(self):
+        return []
+
+    def add_cookie(self, cookie):
+        pass
+
+    def quit(self):
+        pass
+
+
+class CountingPool(BrowserPool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+
+    def browser(self):
+        self.checkouts += 1
+        return super().browser()
+
+
+@pytest.fixture(scope="module")
+def bot(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("bot")
+    with open(workdir / "config.json", "w") as file:
+        json.dump({"api_key": "123456:TEST", "chrome_path": "/nonexistent/chrome",
+                   "chromedriver_path": "/nonexistent/chromedriver", "browser_pool_size": 1}, file)
+    previous = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import user_data_manager
+        user_data_manager.DB_FILE = str(workdir / "users.db")
+        user_data_manager.DATA_FILE = str(workdir / "users.json")
+        yield importlib.import_module("demo1_bot")
+    finally:
+        os.chdir(previous)
+
+
+@pytest.fixture
+def lookup(bot, monkeypatch):
+    launches = []
+    replies = []
+
+    def launch():
+        driver = FakeDriver(MID_MARKS_PAGE)
+        launches.append(driver)
+        return driver
+
+    pool = CountingPool(launch, size=1, checkout_timeout=5)  # A second checkout would otherwise wait forever
+    monkeypatch.setattr(bot, "browser_pool", pool)
+    monkeypatch.setattr(bot, "select_form_details", lambda browser, *selection: True)
+    monkeypatch.setattr(bot, "click_show_button", lambda browser: True)
+    monkeypatch.setattr(bot, "safe_reply_to", lambda message, text, **kwargs: replies.append(text))
+    bot.section_cache.invalidate()
+
+    def run(section, rollno="22KB1A0501"):
+        message = types.Message.de_json({
+            "message_id": 1, "date": 0, "text": rollno,
+            "chat": {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+        })
+        bot.handle_mid_marks_request(message, "2024-25", "31", "5", section, rollno)
+
+    run.launches = launches
+    run.pool = pool
+    run.replies = replies
+    return run
+
+
+def test_one_launch_and_one_checkout_per_lookup(lookup):
+    lookup("C")
+
+    assert len(lookup.launches) == 1
+    assert lookup.pool.checkouts == 1
+    assert "Mid Marks Report" in lookup.replies[-1]
+    assert "22KB1A0501" in lookup.replies[-1]
+
+
+def test_next_lookup_reuses_the_pooled_browser(lookup):
+    lookup("C")
+    lookup("D")
+
+    assert len(lookup.launches) == 1
+    assert lookup.pool.checkouts == 2
+    assert lookup.launches[0].visited == [lookup.launches[0].visited[0]] * 2
+
+
+def test_cached_section_needs_no_browser(lookup, bot):
+    before = bot.section_cache.stats()
+    lookup("C")
+    lookup("C", rollno="22KB1A0502")
+    after = bot.section_cache.stats()
+
+    assert len(lookup.launches) == 1
+    assert lookup.pool.checkouts == 1
+    assert "22KB1A0502" in lookup.replies[-1]
+    # One miss for the cold lookup and one hit for the warm one
+    assert (after["misses"] - before["misses"], after["hits"] - before["hits"]) == (1, 1)
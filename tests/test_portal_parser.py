@@ -0,0 +1,65 @@
+import pytest
+
+import portal_parser
+
+BACKENDS = ["bs4", "lxml"] if portal_parser.lxml else ["bs4"]
+
+
+def attendance_row(rollno, percent_cell="85.5<br><font>120</font>"):
+    return (f"<tr id='{rollno}'><td class='tdRollNo'>{rollno[:6]} {rollno[6:]}</td>"
+            f"<td class='tdPercent'>{percent_cell}</td>"
+            "<td title='DBMS'>20/25</td><td title='OS'>18/22</td></tr>")
+
+
+def mid_marks_row(rollno, marks="12/18(30)"):
+    return (f"<tr name='{rollno}'><td name='DBMS'>{marks}</td><td name='OS'>10/11</td>"
+            "<td>A</td><td>B</td><td>C</td></tr>")
+
+
+def page(*rows):
+    return "<html><body><table><tr><th>Roll</th></tr>" + "".join(rows) + "</table></body></html>"
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_bad_mid_marks_row_is_skipped(backend):
+    html = page(mid_marks_row("22KB1A0501"), mid_marks_row("22KB1A0502", "12/1(8(30)"), mid_marks_row("22KB1A0503"))
+    rows = portal_parser.extract_mid_marks_rows(html, backend)
+    assert sorted(rows) == ["22KB1A0501", "22KB1A0503"]
+
+
+def test_bad_attendance_row_is_skipped():
+    def parse_row(row):
+        if row == "bad":
+            raise TypeError("malformed row")
+        return {"row": row}
+
+    rows = portal_parser.collect_attendance_rows([("1", "good"), ("2", "bad"), ("3", "fine")], parse_row)
+    assert rows == {"1": {"row": "good"}, "3": {"row": "fine"}}
+
+
+EDGE_PERCENT_CELLS = [
+    "85.5<br><font>120</font>",
+    "<b>85.5</b><br><font>120</font>",  # First child is a tag
+    "<!-- updated -->85.5<font>120</font>",
+    "",
+    "  92 <font> 130 </font>",
+]
+
+
+@pytest.mark.skipif(portal_parser.lxml is None, reason="lxml is not installed")
+def test_backends_agree_on_attendance():
+    html = page(*(attendance_row(f"22KB1A05{index:02d}", cell) for index, cell in enumerate(EDGE_PERCENT_CELLS)),
+                "<tr id='22KB1A0599'><td title='DBMS'>1/2</td></tr>")  # No roll or percent cell
+    bs4_rows = portal_parser.extract_attendance_rows(html, "bs4")
+    assert len(bs4_rows) == len(EDGE_PERCENT_CELLS) + 1
+    assert bs4_rows == portal_parser.extract_attendance_rows(html, "lxml")
+    assert bs4_rows["22KB1A0501"]["attendance_percentage"] == ""
+
+
+@pytest.mark.skipif(portal_parser.lxml is None, reason="lxml is not installed")
+def test_backends_agree_on_mid_marks():
+    html = page(mid_marks_row("22KB1A0501"), mid_marks_row("22KB1A0502", "16"),
+                "<tr id='22KB1A0503'><td name='DBMS'> 9 / 12 </td></tr>")
+    bs4_rows = portal_parser.extract_mid_marks_rows(html, "bs4")
+    assert len(bs4_rows) == 3
+    assert bs4_rows == portal_parser.extract_mid_marks_rows(html, "lxml")
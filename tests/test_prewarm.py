@@ -0,0 +1,16 @@
+from prewarm import Prewarmer
+
+
+def test_empty_section_is_backed_off_like_a_failure():
+    fetched = []
+
+    def fetch(key):
+        fetched.append(key)
+        return {} if key == "timed_out" else {"21KB1A0501": ["95%"]}
+
+    prewarmer = Prewarmer(fetch, lambda key: None, lambda: ["timed_out", "ok"], [], pace=0.001)
+
+    assert prewarmer.run_round() == (1, 1)
+    assert prewarmer.run_round() == (1, 0)  # Not retried until the backoff passes
+    assert fetched == ["timed_out", "ok", "ok"]
+    assert prewarmer.stats()["failed"] == 1
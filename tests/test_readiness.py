@@ -0,0 +1,81 @@
+import time
+
+import lxml.html
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+import readiness
+
+
+def ready_after(seconds):
+    """Condition that turns true `seconds` after its first check."""
+    started = []
+
+    def condition(browser):
+        if not started:
+            started.append(time.monotonic())
+        return time.monotonic() - started[0] >= seconds
+    return condition
+
+
+@pytest.fixture
+def learned():
+    """A wait whose learned timeout (0.1s) is far below its ceiling (1s)."""
+    name = f"test_wait_{time.monotonic_ns()}"
+    for _ in range(30):  # Enough history that one timed-out sample does not move the p95
+        readiness.wait_for(object(), name, lambda browser: True, floor=0.1, ceiling=1.0)
+    assert readiness.timeout_for(name).value == pytest.approx(0.1)
+    return name
+
+
+def test_one_slow_page_waits_up_to_the_ceiling(learned):
+    assert readiness.wait_for(object(), learned, ready_after(0.4), floor=0.1, ceiling=1.0)
+    stats = readiness.stats()[learned]
+    assert stats["extended"] == 1
+    assert stats["timeouts"] == 0
+
+
+def test_gives_up_at_the_learned_timeout_while_timing_out(learned):
+    started = time.monotonic()
+    with pytest.raises(TimeoutException):
+        readiness.wait_for(object(), learned, lambda browser: False, floor=0.1, ceiling=1.0)
+    assert time.monotonic() - started >= 0.9  # First timeout still gets the full ceiling
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutException):
+        readiness.wait_for(object(), learned, ready_after(0.6), floor=0.1, ceiling=1.0)
+    assert time.monotonic() - started < 0.9
+    assert readiness.stats()[learned]["timeouts"] == 2
+
+
+class PageDriver:
+    """Fake webdriver whose page is swapped from the layout to the results after `delay` seconds."""
+
+    def __init__(self, layout, results, delay):
+        self.pages = (layout, results)
+        self.swap_at = time.monotonic() + delay
+
+    def find_elements(self, by, value):
+        page = self.pages[time.monotonic() >= self.swap_at]
+        return [dict(element.attrib) for element in lxml.html.document_fromstring(page).xpath(value)]
+
+
+# Layout rows the old "//tr[@id]" / "table" waits stopped on
+LAYOUT = ("<html><body><table id='menu'><tr id='nav'><td class='menu'>Home</td></tr></table>"
+          "<form><table><tr id='selection'><td name='acadYear'><select name='acadYear'></select></td></tr></table></form>"
+          "</body></html>")
+ATTENDANCE_RESULTS = LAYOUT.replace("</body>", "<table><tr id='22KB1A0501'><td class='tdRollNo'>22KB1A 0501</td>"
+                                               "<td class='tdPercent'>85<br><font>120</font></td></tr></table></body>")
+MID_MARKS_RESULTS = LAYOUT.replace("</body>", "<table><tr name='22KB1A0501'><td name='DBMS'>14/12(13)</td></tr></table></body>")
+
+
+@pytest.mark.parametrize("locator, results", [
+    (readiness.ATTENDANCE_ROW, ATTENDANCE_RESULTS),
+    (readiness.MID_MARKS_ROW, MID_MARKS_RESULTS),
+])
+def test_result_waits_ignore_the_page_layout(locator, results):
+    browser = PageDriver(LAYOUT, results, delay=0.3)
+    started = time.monotonic()
+    row = readiness.wait_for(browser, f"test_rows_{time.monotonic_ns()}", readiness.first_present(locator), ceiling=2)
+    assert time.monotonic() - started >= 0.3
+    assert row.get("id") == "22KB1A0501" or row.get("name") == "22KB1A0501"
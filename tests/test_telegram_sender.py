@@ -0,0 +1,41 @@
+import threading
+import time
+
+from telegram_sender import TelegramSender
+
+
+def test_calls_to_one_chat_run_in_arrival_order():
+    sender = TelegramSender(rate=1000)
+    release = threading.Event()
+    order = []
+
+    def send(number):
+        if number == 0:
+            release.wait(5)  # Hold the chat so every later call has to queue
+        order.append(number)
+
+    threads = []
+    for number in range(20):
+        thread = threading.Thread(target=sender.call, args=(42, send, number))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.005)  # Arrive one after another
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert order == list(range(20))
+    assert sender.stats() == {"sent": 20, "active_chats": 0}
+
+
+def test_a_failed_call_does_not_block_the_chat():
+    sender = TelegramSender(rate=1000)
+
+    def fail():
+        raise RuntimeError("Bad Request")
+
+    try:
+        sender.call(42, fail)
+    except RuntimeError:
+        pass
+    assert sender.call(42, lambda: "sent") == "sent"
@@ -0,0 +1,210 @@
+"""Per-stage latency tracing for the lookup pipeline.
+
+A lookup runs inside ``request(page_kind, request_id)``; every ``stage(name)``
+entered on the same thread (as a ``with`` block or a decorator) records its
+duration twice: in the request's own trace, which is logged when the request
+ends, and in a rolling window per (stage, page kind) that ``stats()`` and
+``prometheus_text()`` turn into p50/p95/p99. Stages outside a request (e.g.
+browser warmup) are recorded under the page kind "-".
+"""
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import ContextDecorator, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WINDOW = 500  # Recent durations kept per (stage, page kind)
+RECENT_REQUESTS = 50  # Finished request traces kept for /stats
+QUANTILES = (0.5, 0.95, 0.99)
+NO_PAGE = "-"
+
+
+class StageHistogram:
+    """Rolling window of one stage's durations, plus all-time count and sum."""
+
+    def __init__(self, window=WINDOW):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def snapshot(self):
+        samples = sorted(self._samples)
+        quantiles = {q: samples[min(len(samples) - 1, int(len(samples) * q))] for q in QUANTILES} if samples else {}
+        return {"count": self.count, "sum": self.total, "quantiles": quantiles}
+
+
+_histograms = {}  # (stage, page kind) -> StageHistogram
+_recent = deque(maxlen=RECENT_REQUESTS)
+_lock = threading.Lock()
+_local = threading.local()
+_ids = itertools.count(1)
+
+
+def current():
+    """The trace of the request running on this thread, or None."""
+    return getattr(_local, "trace", None)
+
+
+def _observe(name, page_kind, seconds):
+    with _lock:
+        histogram = _histograms.get((name, page_kind))
+        if histogram is None:
+            histogram = _histograms[(name, page_kind)] = StageHistogram()
+        histogram.record(seconds)
+
+
+def record(name, seconds):
+    """Record one duration for stage `name` in the current request (if any)."""
+    trace = current()
+    _observe(name, trace["page_kind"] if trace else NO_PAGE, seconds)
+    if trace is not None:
+        trace["stages"].append((name, seconds))
+
+
+class stage(ContextDecorator):
+    """Time a block or a function as the pipeline stage `name`.
+
+        with stage("parse"):
+            ...
+
+        @stage("login")
+        def ensure_portal_session(...):
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._started = None
+
+    def _recreate_cm(self):
+        return stage(self.name)  # One decorated function may run on many threads at once
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self._started)
+        return False
+
+
+@contextmanager
+def request(page_kind, request_id=None):
+    """Trace one lookup; its stages are logged as one line when it ends."""
+    trace = {
+        "id": request_id if request_id is not None else next(_ids),
+        "page_kind": page_kind,
+        "stages": [],
+        "started": time.time(),
+    }
+    previous, _local.trace = current(), trace
+    started = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace["elapsed"] = time.perf_counter() - started
+        _local.trace = previous
+        _observe("total", page_kind, trace["elapsed"])
+        with _lock:
+            _recent.append(trace)
+        breakdown = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in trace["stages"])
+        logging.info(f"Request {trace['id']} ({page_kind}) took {trace['elapsed']:.2f}s: {breakdown or 'no stages'}")
+
+
+def stats():
+    """{page kind: {stage: {count, p50, p95, p99}}} for every stage seen so far."""
+    with _lock:
+        snapshots = {key: histogram.snapshot() for key, histogram in _histograms.items()}
+    result = {}
+    for (name, page_kind), snapshot in sorted(snapshots.items(), key=lambda item: (item[0][1], item[0][0])):
+        entry = {"count": snapshot["count"]}
+        for q, value in snapshot["quantiles"].items():
+            entry[f"p{round(q * 100)}"] = round(value, 3)
+        result.setdefault(page_kind, {})[name] = entry
+    return result
+
+
+def slowest(limit=3):
+    """The slowest of the recently finished requests, slowest first."""
+    with _lock:
+        traces = list(_recent)
+    return sorted(traces, key=lambda trace: trace["elapsed"], reverse=True)[:limit]
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _recent.clear()
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def prometheus_text(gauges=None):
+    """Stage latencies as a Prometheus summary, followed by `gauges` ({metric name: value})."""
+    with _lock:
+        snapshots = {key: histogram.snapshot() for key, histogram in _histograms.items()}
+    lines = [
+        "# HELP nbkrist_stage_seconds Duration of lookup pipeline stages.",
+        "# TYPE nbkrist_stage_seconds summary",
+    ]
+    for (name, page_kind), snapshot in sorted(snapshots.items()):
+        for q, value in snapshot["quantiles"].items():
+            lines.append(f"nbkrist_stage_seconds{{{_labels(stage=name, page=page_kind, quantile=q)}}} {value:.6f}")
+        lines.append(f"nbkrist_stage_seconds_sum{{{_labels(stage=name, page=page_kind)}}} {snapshot['sum']:.6f}")
+        lines.append(f"nbkrist_stage_seconds_count{{{_labels(stage=name, page=page_kind)}}} {snapshot['count']}")
+    for metric, value in (gauges or {}).items():
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serve ``prometheus_text()`` on GET /metrics. `gauges` is called on every scrape."""
+
+    def __init__(self, port, listen="127.0.0.1", gauges=None):
+        self.gauges = gauges
+        self.server = ThreadingHTTPServer((listen, port), self._handler_class())
+        self.server.daemon_threads = True
+
+    def _handler_class(self):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                try:
+                    body = prometheus_text(metrics.gauges() if metrics.gauges else None).encode()
+                except Exception as e:
+                    logging.exception(f"Error rendering metrics: {e}")
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the bot log
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="MetricsServer", daemon=True).start()
+        host, port = self.server.server_address[:2]
+        logging.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
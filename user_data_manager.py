@@ -1,37 +1,285 @@
+import atexit
 import json
+import logging
 import os
+import sqlite3
+import tempfile
+import threading
 
-# Define the JSON file name
+# Legacy JSON store, migrated into the database on first use
 DATA_FILE = "nbkrist_attendance_user_data.json"
+# SQLite database holding one row per (user, field)
+DB_FILE = "nbkrist_attendance_user_data.db"
 
-def load_user_data():
-    """Load user data from the JSON file."""
-    if os.path.exists(DATA_FILE):
+FLUSH_INTERVAL = 5  # Seconds between background flushes of changed users
+FLUSH_THRESHOLD = 50  # Flush early once this many users have unsaved changes
+
+_local = threading.local()  # One connection per thread
+_init_lock = threading.Lock()
+_initialized = False
+
+# In-memory copy of the store; the source of truth while the process runs
+_cache = None
+_dirty = set()  # User ids changed since the last flush
+_deleted = set()  # User ids removed since the last flush
+_cache_lock = threading.RLock()
+
+# Fields indexed for targeted broadcasts ("CSE 3-1 section C")
+INDEXED_FIELDS = ("marks_academic_year", "marks_year_of_study", "marks_branch", "marks_section")
+_index = {}  # (field, normalized value) -> set of user ids
+_indexed = {}  # user id -> (field, normalized value) pairs it is listed under
+_flush_lock = threading.Lock()
+_flush_event = threading.Event()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (user_id, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def _connect():
+    """Return this thread's database connection, creating the schema on first use."""
+    global _initialized
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_FILE, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                with conn:
+                    conn.executescript(SCHEMA)
+                migrate_from_json(conn)
+                _initialized = True
+    return conn
+
+def migrate_from_json(conn=None, path=None):
+    """One-shot import of the legacy JSON user file (DATA_FILE by default). Returns the number of users imported."""
+    path = path or DATA_FILE
+    conn = conn or _connect()
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+        return 0
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "r") as file:
+            data = json.load(file) or {}
+    except json.JSONDecodeError as e:
+        # Leave the file alone so nothing is lost; it can be fixed and migrated later
+        logging.error(f"Cannot migrate {path}, invalid JSON: {e}")
+        return 0
+
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO user_data (user_id, key, value) VALUES (?, ?, ?)",
+            [(str(user_id), key, json.dumps(value)) for user_id, fields in data.items() for key, value in fields.items()]
+        )
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)", (path,))
+    logging.info(f"Migrated {len(data)} users from {path} to {DB_FILE}")
+    return len(data)
+
+def _read_all():
+    data = {}
+    for user_id, key, value in _connect().execute("SELECT user_id, key, value FROM user_data"):
+        data.setdefault(user_id, {})[key] = json.loads(value)
+    return data
+
+def _normalize(value):
+    return str(value).strip().upper()
+
+def _reindex_user(user_id, fields):
+    """Move a user to the index entries matching their current fields. Call with _cache_lock held."""
+    for entry in _indexed.pop(user_id, ()):
+        users = _index.get(entry)
+        if users is not None:
+            users.discard(user_id)
+            if not users:
+                del _index[entry]
+    entries = tuple((field, _normalize(fields[field])) for field in INDEXED_FIELDS if fields.get(field) not in (None, ""))
+    for entry in entries:
+        _index.setdefault(entry, set()).add(user_id)
+    if entries:
+        _indexed[user_id] = entries
+
+def _rebuild_index():
+    _index.clear()
+    _indexed.clear()
+    for user_id, fields in _cache.items():
+        _reindex_user(user_id, fields)
+
+def _get_cache():
+    """Return the in-memory store, loading it and starting the flusher on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = _read_all()
+                _rebuild_index()
+                threading.Thread(target=_flush_loop, name="UserDataFlusher", daemon=True).start()
+                atexit.register(flush)
+    return _cache
+
+def _flush_loop():
+    while True:
+        _flush_event.wait(FLUSH_INTERVAL)
+        _flush_event.clear()
         try:
-            with open(DATA_FILE, "r") as file:
-                data = json.load(file)
-                return data if data else {} # Handle empty JSON
-        except json.JSONDecodeError:
-            # Handle invalid JSON by resetting the file
-            with open(DATA_FILE, "w") as file:
-                file.write("{}")
-            return {}
-    return {}
+            flush()
+        except Exception as e:
+            logging.exception(f"Error flushing user data: {e}")
+
+def flush():
+    """Write every changed user to the database in one transaction."""
+    with _flush_lock:
+        with _cache_lock:
+            if not _dirty and not _deleted:
+                return 0
+            changed = {user_id: dict(_cache.get(user_id, {})) for user_id in _dirty}
+            deleted = set(_deleted)
+            _dirty.clear()
+            _deleted.clear()
+        try:
+            conn = _connect()
+            with conn:
+                conn.executemany("DELETE FROM user_data WHERE user_id = ?", [(user_id,) for user_id in deleted])
+                conn.executemany(
+                    "INSERT OR REPLACE INTO user_data (user_id, key, value) VALUES (?, ?, ?)",
+                    [(user_id, key, json.dumps(value)) for user_id, fields in changed.items() for key, value in fields.items()]
+                )
+        except Exception:
+            with _cache_lock:
+                # Retry on the next flush
+                _dirty.update(changed)
+                _deleted.update(deleted)
+            raise
+        return len(changed) + len(deleted)
+
+def load_user_data():
+    """Load every user's data as {user_id: {key: value}}."""
+    cache = _get_cache()
+    with _cache_lock:
+        return {user_id: dict(fields) for user_id, fields in cache.items()}
 
 def save_user_data(data):
-    """Save user data to the JSON file."""
-    with open(DATA_FILE, "w") as file:
-        json.dump(data, file, indent=4)
+    """Replace the whole user store with data."""
+    global _cache
+    with _flush_lock, _cache_lock:
+        conn = _connect()
+        with conn:
+            conn.execute("DELETE FROM user_data")
+            conn.executemany(
+                "INSERT INTO user_data (user_id, key, value) VALUES (?, ?, ?)",
+                [(str(user_id), key, json.dumps(value)) for user_id, fields in data.items() for key, value in fields.items()]
+            )
+        _get_cache()
+        _cache = {str(user_id): dict(fields) for user_id, fields in data.items()}
+        _rebuild_index()
+        _dirty.clear()
+        _deleted.clear()
+
+def update_user_fields(user_id, fields):
+    """Update several fields of a user; written to disk by the next flush."""
+    cache = _get_cache()
+    user_id = str(user_id)
+    with _cache_lock:
+        user = cache.setdefault(user_id, {})
+        user.update(fields)
+        if any(field in fields for field in INDEXED_FIELDS):
+            _reindex_user(user_id, user)
+        _dirty.add(user_id)
+        if len(_dirty) >= FLUSH_THRESHOLD:
+            _flush_event.set()
 
 def update_user_data(user_id, key, value):
     """Update a user's data and save it."""
-    data = load_user_data()
-    if user_id not in data:
-        data[user_id] = {}
-    data[user_id][key] = value
-    save_user_data(data)
+    update_user_fields(user_id, {key: value})
+
+def delete_user(user_id):
+    """Remove a user and all their data."""
+    cache = _get_cache()
+    user_id = str(user_id)
+    with _cache_lock:
+        if cache.pop(user_id, None) is None:
+            return False
+        _reindex_user(user_id, {})
+        _dirty.discard(user_id)
+        _deleted.add(user_id)
+        return True
 
 def get_user_data(user_id, key, default=None):
     """Retrieve specific data for a user."""
+    cache = _get_cache()
+    with _cache_lock:
+        return cache.get(str(user_id), {}).get(key, default)
+
+def find_users(criteria):
+    """Return the ids of users whose fields match every {field: value} in criteria.
+
+    Values are compared case-insensitively. Indexed fields are answered from
+    the in-memory index; any other field is checked only on those candidates.
+    """
+    cache = _get_cache()
+    indexed = [(field, _normalize(value)) for field, value in criteria.items() if field in INDEXED_FIELDS]
+    others = [(field, _normalize(value)) for field, value in criteria.items() if field not in INDEXED_FIELDS]
+    with _cache_lock:
+        if indexed:
+            postings = sorted((_index.get(entry, set()) for entry in indexed), key=len)
+            users = set(postings[0]).intersection(*postings[1:])
+        else:
+            users = set(cache)
+        return {user_id for user_id in users
+                if all(_normalize(cache[user_id].get(field, "")) == value for field, value in others)}
+
+def class_counts(academic_year=None):
+    """Count users per class, {(academic year, year of study, branch, section): users}.
+
+    Built from the index, so only users with all four marks_* fields count.
+    Values come back normalized (upper case).
+    """
+    _get_cache()
+    counts = {}
+    with _cache_lock:
+        if academic_year is None:
+            users = _indexed.keys()
+        else:
+            users = _index.get(("marks_academic_year", _normalize(academic_year)), ())
+        for user_id in users:
+            entries = _indexed.get(user_id, ())
+            if len(entries) == len(INDEXED_FIELDS):
+                key = tuple(value for _, value in entries)
+                counts[key] = counts.get(key, 0) + 1
+    return counts
+
+def export_json(path=None):
+    """Write a JSON snapshot of the store atomically (temp file + rename) to path, or DATA_FILE."""
+    path = path or DATA_FILE
     data = load_user_data()
-    return data.get(user_id, {}).get(key, default)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".user_data_", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump(data, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return len(data)
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    _connect()
+    print(f"{len(load_user_data())} users in {DB_FILE}")
+    if "--export" in sys.argv:
+        print(f"Exported {export_json()} users to {DATA_FILE}")
@@ -0,0 +1,150 @@
+"""Receive Telegram updates over a webhook instead of long polling.
+
+Telegram POSTs every update as JSON to the configured URL; the server hands
+it to ``bot.process_new_updates`` so the existing handlers run unchanged.
+Run this file directly to post a recorded update JSON to a local server.
+"""
+import argparse
+import hmac
+import json
+import logging
+import ssl
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from telebot import types
+
+MAX_UPDATE_SIZE = 1024 * 1024  # Telegram updates are far smaller; reject anything bigger
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Threaded HTTP server feeding Telegram webhook updates into a TeleBot.
+
+    Requests must carry ``secret_token`` in the X-Telegram-Bot-Api-Secret-Token
+    header when one is configured. ``certificate``/``private_key`` serve HTTPS
+    directly; leave them unset when a reverse proxy terminates TLS.
+
+    Updates are handed to a pool of ``workers`` threads, so Telegram gets its
+    200 right away even when the bot processes updates inline
+    (``threaded=False``). At most ``workers * 4`` updates wait for a worker;
+    beyond that the response is held back until one is free.
+    """
+
+    def __init__(self, bot, url, listen="0.0.0.0", port=8443, path="/telegram-webhook",
+                 secret_token=None, certificate=None, private_key=None, workers=8):
+        self.bot = bot
+        self.url = url
+        self.path = path
+        self.secret_token = secret_token
+        self.certificate = certificate
+        self.received = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="WebhookWorker")
+        self._slots = threading.BoundedSemaphore(workers * 4)
+        self.server = ThreadingHTTPServer((listen, port), self._handler_class())
+        self.server.daemon_threads = True
+        if certificate and private_key:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certificate, private_key)
+            self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+        self._thread = None
+
+    def register(self):
+        """Tell Telegram where to deliver updates."""
+        certificate = open(self.certificate, "rb") if self.certificate else None
+        try:
+            self.bot.remove_webhook()
+            self.bot.set_webhook(url=self.url, certificate=certificate, secret_token=self.secret_token)
+        finally:
+            if certificate:
+                certificate.close()
+        logging.info(f"Webhook registered at {self.url}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="WebhookServer", daemon=True)
+        self._thread.start()
+        host, port = self.server.server_address[:2]
+        logging.info(f"Webhook server listening on {host}:{port}{self.path}")
+        return self
+
+    def stop(self):
+        """Stop accepting updates. The webhook stays registered, so Telegram keeps
+        queueing updates until the bot is back."""
+        self.server.shutdown()
+        self.server.server_close()
+        self._executor.shutdown(wait=True)  # Let updates already accepted finish
+        logging.info("Webhook server stopped")
+
+    def handle(self, path, headers, body):
+        """Return the HTTP status for one webhook request."""
+        if path != self.path:
+            return 404
+        if self.secret_token and not hmac.compare_digest(headers.get(SECRET_HEADER, ""), self.secret_token):
+            with self._lock:
+                self.rejected += 1
+            logging.warning("Webhook request with a wrong secret token rejected")
+            return 403
+        try:
+            update = types.Update.de_json(body.decode("utf-8"))
+        except Exception as e:
+            logging.warning(f"Invalid webhook update: {e}")
+            return 400
+        with self._lock:
+            self.received += 1
+        self._slots.acquire()  # Backpressure: hold the response while the pool is saturated
+        self._executor.submit(self._process, update)
+        return 200
+
+    def _process(self, update):
+        try:
+            self.bot.process_new_updates([update])
+        except Exception as e:
+            logging.exception(f"Error processing webhook update {update.update_id}: {e}")
+        finally:
+            self._slots.release()
+
+    def _handler_class(self):
+        webhook = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _respond(self, status):
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                self._respond(200 if self.path == "/healthz" else 404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > MAX_UPDATE_SIZE:
+                    self._respond(413)
+                    return
+                self._respond(webhook.handle(self.path, self.headers, self.rfile.read(length)))
+
+        return Handler
+
+
+def post_update(url, update, secret_token=None):
+    """POST a recorded update (dict) to a webhook server, like Telegram would."""
+    headers = {SECRET_HEADER: secret_token} if secret_token else {}
+    return requests.post(url, json=update, headers=headers, timeout=10).status_code
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Post recorded Telegram update JSON to a local webhook server.")
+    parser.add_argument("update_file", help="File holding one update object or a list of them")
+    parser.add_argument("--url", default="http://127.0.0.1:8443/telegram-webhook")
+    parser.add_argument("--secret-token", help="Value of the X-Telegram-Bot-Api-Secret-Token header")
+    args = parser.parse_args()
+    with open(args.update_file, "r") as file:
+        updates = json.load(file)
+    for update in updates if isinstance(updates, list) else [updates]:
+        print(f"update {update.get('update_id')}: HTTP {post_update(args.url, update, args.secret_token)}")